@@ -1,11 +1,17 @@
 #!/usr/bin/env python3
 """ A function that returns a hashed password."""
 import bcrypt
+import os
 
 
 def hash_password(password: str) -> bytes:
-    """ Method to hash the password."""
-    hashed = bcrypt.hashpw(password.encode('utf-8'),  bcrypt.gensalt())
+    """ Method to hash the password, with the bcrypt work factor
+    set in BCRYPT_ROUNDS (default 12)."""
+    try:
+        rounds = int(os.getenv('BCRYPT_ROUNDS', 12))
+    except ValueError:
+        rounds = 12
+    hashed = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds))
     return hashed
 
 
@@ -1,37 +1,103 @@
 #!/usr/bin/env python3
 """ Base module
 """
+from bisect import bisect_left, bisect_right, insort
+from contextlib import contextmanager
 from datetime import datetime
 from typing import TypeVar, List, Iterable
-from os import path
-import json
+from models.engine import get_storage
+from models import timestamp
+from models.rwlock import RWLock
+from models.timestamp import TIMESTAMP_FORMAT
+from os import getenv
+import threading
 import uuid
 
 
-TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S"
 DATA = {}
+INDEXES = {}
+INDEXED_VALUES = {}
+ORDERED_IDS = {}
+# (created_at, id) pairs in creation order, for the classes with
+# ordered_by_creation set
+CREATED_ORDER = {}
+# One RWLock per class guards its entries in DATA and the indexes
+LOCKS = {}
+LOCKS_LOCK = threading.Lock()
+HYDRATE_LOCK = threading.Lock()
+storage = get_storage(DATA)
+
+
+class Record(tuple):
+    """ JSON values of a lazily loaded object, in the _fields order of
+    its model: a tuple costs a fraction of the JSON dictionary
+    """
+    __slots__ = ()
+    fields = ()
+
+    def to_json(self, for_serialization: bool = False) -> dict:
+        """ JSON dictionary the values were loaded from
+        """
+        return dict(zip(self.fields, self))
 
 
 class Base():
     """ Base class
     """
+    # Fields of a model are the __slots__ declared along its class
+    # hierarchy: each model declares its own __slots__
+    __slots__ = ('id', 'created_at', 'updated_at')
+    timestamp_fields = ('created_at', 'updated_at')
+    # Attributes served by a secondary index in Base.search, mapped to
+    # True when the attribute value must be unique
+    indexed_attributes = {}
+    # Keep the objects sorted by created_at for created_before()
+    ordered_by_creation = False
+
+    def __init_subclass__(cls, **kwargs):
+        """ Build the field schema of each model
+        """
+        super().__init_subclass__(**kwargs)
+        cls._build_schema()
+
+    @classmethod
+    def _build_schema(cls):
+        """ Precompute the (field, is_timestamp) pairs used by to_json
+        """
+        fields = []
+        for klass in reversed(cls.__mro__):
+            for field in klass.__dict__.get('__slots__', ()):
+                if field not in fields:
+                    fields.append(field)
+        cls._fields = tuple((field, field in cls.timestamp_fields)
+                            for field in fields)
+        cls._public_fields = tuple(field for field in cls._fields
+                                   if field[0][0] != '_')
+        names = tuple(field for field, _ in cls._fields)
+        cls._positions = {field: i for i, field in enumerate(names)}
+        cls._record = type(cls.__name__ + 'Record', (Record,),
+                           {'__slots__': (), 'fields': names})
 
     def __init__(self, *args: list, **kwargs: dict):
         """ Initialize a Base instance
         """
         s_class = str(self.__class__.__name__)
         if DATA.get(s_class) is None:
-            DATA[s_class] = {}
+            with self.__class__._lock().write():
+                if DATA.get(s_class) is None:
+                    self.__class__._reset_indexes()
+                    DATA[s_class] = {}
 
-        self.id = kwargs.get('id', str(uuid.uuid4()))
+        if 'id' in kwargs:
+            self.id = kwargs['id']
+        else:
+            self.id = str(uuid.uuid4())
         if kwargs.get('created_at') is not None:
-            self.created_at = datetime.strptime(kwargs.get('created_at'),
-                                                TIMESTAMP_FORMAT)
+            self.created_at = timestamp.parse(kwargs.get('created_at'))
         else:
             self.created_at = datetime.utcnow()
         if kwargs.get('updated_at') is not None:
-            self.updated_at = datetime.strptime(kwargs.get('updated_at'),
-                                                TIMESTAMP_FORMAT)
+            self.updated_at = timestamp.parse(kwargs.get('updated_at'))
         else:
             self.updated_at = datetime.utcnow()
 
@@ -44,69 +110,216 @@ class Base():
             return False
         return (self.id == other.id)
 
-    def to_json(self, for_serialization: bool = False) -> dict:
+    def to_json(self, for_serialization: bool = False,
+                fields: Iterable[str] = None) -> dict:
         """ Convert the object a JSON dictionary
+        fields, if given, restricts the result to these public fields
         """
         result = {}
-        for key, value in self.__dict__.items():
-            if not for_serialization and key[0] == '_':
-                continue
-            if type(value) is datetime:
-                result[key] = value.strftime(TIMESTAMP_FORMAT)
+        if for_serialization:
+            schema = self._fields
+            encode = timestamp.serialize
+        else:
+            schema = self._public_fields
+            encode = timestamp.to_string
+        if fields is not None:
+            schema = [field for field in schema if field[0] in fields]
+        for key, is_timestamp in schema:
+            value = getattr(self, key)
+            if is_timestamp and value is not None:
+                result[key] = encode(value)
             else:
                 result[key] = value
         return result
 
     @classmethod
-    def load_from_file(cls):
+    def load_from_file(cls, lazy: bool = None):
         """ Load all objects from file
+        In lazy mode (default: STORAGE_LAZY_LOAD=1) objects are kept as
+        Records of their JSON values until first returned by get() or
+        search()
         """
+        if lazy is None:
+            lazy = getenv('STORAGE_LAZY_LOAD') == '1'
         s_class = cls.__name__
-        file_path = ".db_{}.json".format(s_class)
-        DATA[s_class] = {}
-        if not path.exists(file_path):
-            return
-
-        with open(file_path, 'r') as f:
-            objs_json = json.load(f)
-            for obj_id, obj_json in objs_json.items():
-                DATA[s_class][obj_id] = cls(**obj_json)
+        with cls._lock().write():
+            DATA[s_class] = {}
+            cls._reset_indexes()
+            for obj_id, obj_json in storage.load(s_class):
+                if obj_json is None:
+                    DATA[s_class].pop(obj_id, None)
+                    cls._unindex(obj_id)
+                    continue
+                if lazy:
+                    obj = cls._record(map(obj_json.get,
+                                          cls._record.fields))
+                else:
+                    obj = cls(**obj_json)
+                DATA[s_class][obj_id] = obj
+                cls._index(obj_id, obj, check_unique=False)
+            ORDERED_IDS[s_class] = sorted(DATA[s_class])
+            if cls.ordered_by_creation:
+                CREATED_ORDER[s_class] = sorted(
+                        (cls._created_at(obj), obj_id)
+                        for obj_id, obj in DATA[s_class].items())
 
     @classmethod
     def save_to_file(cls):
         """ Save all objects to file
         """
-        s_class = cls.__name__
-        file_path = ".db_{}.json".format(s_class)
-        objs_json = {}
-        for obj_id, obj in DATA[s_class].items():
-            objs_json[obj_id] = obj.to_json(True)
-
-        with open(file_path, 'w') as f:
-            json.dump(objs_json, f)
+        storage.dump(cls.__name__)
 
     def save(self):
         """ Save current object
         """
         s_class = self.__class__.__name__
-        self.updated_at = datetime.utcnow()
-        DATA[s_class][self.id] = self
-        self.__class__.save_to_file()
+        with self.__class__._lock().write():
+            self.__class__._index(self.id, self)
+            self.updated_at = datetime.utcnow()
+            old = DATA[s_class].get(self.id)
+            if old is None:
+                insort(ORDERED_IDS[s_class], self.id)
+            if self.ordered_by_creation:
+                if old is not None:
+                    self.__class__._unorder(self.id, old)
+                insort(CREATED_ORDER[s_class],
+                       (self.__class__._created_at(self), self.id))
+            DATA[s_class][self.id] = self
+            storage.put(s_class, self)
 
     def remove(self):
         """ Remove object
         """
         s_class = self.__class__.__name__
-        if DATA[s_class].get(self.id) is not None:
+        with self.__class__._lock().write():
+            old = DATA[s_class].get(self.id)
+            if old is None:
+                return
+            if self.ordered_by_creation:
+                self.__class__._unorder(self.id, old)
             del DATA[s_class][self.id]
-            self.__class__.save_to_file()
+            self.__class__._unindex(self.id)
+            ordered_ids = ORDERED_IDS[s_class]
+            del ordered_ids[bisect_left(ordered_ids, self.id)]
+            storage.delete(s_class, self.id)
+
+    @classmethod
+    @contextmanager
+    def batch(cls):
+        """ Persist every save()/remove() done in the block
+        with a single write when it ends
+        """
+        storage.begin()
+        try:
+            yield
+        finally:
+            storage.commit()
+
+    @classmethod
+    def _lock(cls) -> RWLock:
+        """ Return the RWLock of the class
+        """
+        s_class = cls.__name__
+        lock = LOCKS.get(s_class)
+        if lock is None:
+            with LOCKS_LOCK:
+                lock = LOCKS.setdefault(s_class, RWLock())
+        return lock
+
+    @classmethod
+    def _reset_indexes(cls):
+        """ Drop and recreate the empty secondary indexes of the class
+        """
+        s_class = cls.__name__
+        INDEXES[s_class] = {attr: {} for attr in cls.indexed_attributes}
+        INDEXED_VALUES[s_class] = {}
+        ORDERED_IDS[s_class] = []
+        CREATED_ORDER[s_class] = []
+
+    @classmethod
+    def _index(cls, obj_id: str, obj, check_unique: bool = True):
+        """ Add (or refresh) an object, or its Record, in the
+        secondary indexes
+        Raise a ValueError if a unique attribute is already used
+        by another object
+        """
+        s_class = cls.__name__
+        indexes = INDEXES[s_class]
+        if isinstance(obj, Record):
+            values = {attr: obj[cls._positions[attr]] for attr in indexes}
+        else:
+            values = {attr: getattr(obj, attr, None) for attr in indexes}
+        if check_unique:
+            for attr, value in values.items():
+                if not cls.indexed_attributes[attr] or value is None:
+                    continue
+                obj_ids = indexes[attr].get(value, set())
+                if len(obj_ids - {obj_id}) > 0:
+                    raise ValueError("{} with {} {} already exists"
+                                     .format(s_class, attr, value))
+
+        if obj_id in INDEXED_VALUES[s_class]:
+            cls._unindex(obj_id)
+        for attr, value in values.items():
+            indexes[attr].setdefault(value, set()).add(obj_id)
+        INDEXED_VALUES[s_class][obj_id] = values
+
+    @classmethod
+    def _unindex(cls, obj_id: str):
+        """ Remove an object ID from the secondary indexes
+        """
+        s_class = cls.__name__
+        indexes = INDEXES[s_class]
+        values = INDEXED_VALUES[s_class].pop(obj_id, {})
+        for attr, value in values.items():
+            obj_ids = indexes[attr].get(value)
+            if obj_ids is None:
+                continue
+            obj_ids.discard(obj_id)
+            if len(obj_ids) == 0:
+                del indexes[attr][value]
+
+    @classmethod
+    def _created_at(cls, obj) -> datetime:
+        """ Creation time of an object or of its Record
+        """
+        if isinstance(obj, Record):
+            value = obj[cls._positions['created_at']]
+            return datetime.min if value is None else timestamp.parse(value)
+        return obj.created_at or datetime.min
+
+    @classmethod
+    def _unorder(cls, obj_id: str, obj):
+        """ Remove an object from the creation order (lock must be held)
+        """
+        created_order = CREATED_ORDER[cls.__name__]
+        i = bisect_left(created_order, (cls._created_at(obj), obj_id))
+        if i < len(created_order) and created_order[i][1] == obj_id:
+            del created_order[i]
+
+    @classmethod
+    def _hydrate(cls, obj_id: str, obj) -> TypeVar('Base'):
+        """ Return the object of a lazily loaded Record
+        Readers may hydrate concurrently: the first object stored wins
+        """
+        if not isinstance(obj, Record):
+            return obj
+        s_class = cls.__name__
+        hydrated = cls(**obj.to_json(True))
+        with HYDRATE_LOCK:
+            obj = DATA[s_class].get(obj_id)
+            if isinstance(obj, Record):
+                DATA[s_class][obj_id] = hydrated
+                obj = hydrated
+        return obj
 
     @classmethod
     def count(cls) -> int:
         """ Count all objects
         """
         s_class = cls.__name__
-        return len(DATA[s_class].keys())
+        with cls._lock().read():
+            return len(DATA[s_class].keys())
 
     @classmethod
     def all(cls) -> Iterable[TypeVar('Base')]:
@@ -119,13 +332,61 @@ class Base():
         """ Return one object by ID
         """
         s_class = cls.__name__
-        return DATA[s_class].get(id)
+        with cls._lock().read():
+            obj = DATA[s_class].get(id)
+            if obj is None:
+                return None
+            return cls._hydrate(id, obj)
+
+    @classmethod
+    def page(cls, after: str = None,
+             limit: int = None) -> List[TypeVar('Base')]:
+        """ Return up to limit objects in ID order, starting after
+        the ID given as cursor
+        """
+        s_class = cls.__name__
+        with cls._lock().read():
+            ordered_ids = ORDERED_IDS[s_class]
+            start = 0 if after is None else bisect_right(ordered_ids, after)
+            end = len(ordered_ids) if limit is None else start + limit
+            return [cls._hydrate(obj_id, DATA[s_class][obj_id])
+                    for obj_id in ordered_ids[start:end]]
+
+    @classmethod
+    def created_before(cls, before: datetime) -> List[TypeVar('Base')]:
+        """ Return the objects created before a time, oldest first
+        Only available on models with ordered_by_creation set; objects
+        created later are neither visited nor hydrated
+        """
+        s_class = cls.__name__
+        with cls._lock().read():
+            created_order = CREATED_ORDER[s_class]
+            end = bisect_left(created_order, (before,))
+            return [cls._hydrate(obj_id, DATA[s_class][obj_id])
+                    for _, obj_id in created_order[:end]]
 
     @classmethod
     def search(cls, attributes: dict = {}) -> List[TypeVar('Base')]:
         """ Search all objects with matching attributes
+        Equality on indexed attributes is resolved from the most
+        selective index, other attributes are matched on the resulting
+        candidates only
         """
         s_class = cls.__name__
+        with cls._lock().read():
+            obj_ids = DATA[s_class].keys()
+            indexes = INDEXES.get(s_class, {})
+            for k, v in attributes.items():
+                if k in indexes:
+                    try:
+                        candidates = indexes[k].get(v, ())
+                    except TypeError:
+                        continue
+                    if len(candidates) < len(obj_ids):
+                        obj_ids = candidates
+            objs = [cls._hydrate(obj_id, DATA[s_class][obj_id])
+                    for obj_id in list(obj_ids)]
+
         def _search(obj):
             if len(attributes) == 0:
                 return True
@@ -134,4 +395,7 @@ class Base():
                     return False
             return True
 
-        return list(filter(_search, DATA[s_class].values()))
+        return list(filter(_search, objs))
+
+
+Base._build_schema()
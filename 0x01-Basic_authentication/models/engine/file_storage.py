@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+""" FileStorage module
+"""
+from typing import Iterable, Tuple
+from os import getenv, path
+import atexit
+import json
+import os
+import threading
+import time
+
+
+def iter_json_object(f, chunk_size: int = 1 << 16) -> Iterable[Tuple]:
+    """ Yield the (key, value) pairs of the JSON object in a file
+    one by one, reading it by chunks instead of as a whole document
+    """
+    decoder = json.JSONDecoder()
+    buf = ''
+    pos = 0
+    eof = False
+    state = 'start'
+    key = None
+    while True:
+        while pos < len(buf) and buf[pos] in ' \t\n\r':
+            pos += 1
+        if pos == len(buf) and not eof:
+            buf = f.read(chunk_size)
+            pos = 0
+            eof = len(buf) == 0
+            continue
+        if pos == len(buf):
+            if state != 'end':
+                raise ValueError("Unexpected end of JSON document")
+            return
+        if state == 'end':
+            raise ValueError("Extra data after JSON document")
+
+        char = buf[pos]
+        if state == 'start':
+            if char != '{':
+                raise ValueError("JSON document is not an object")
+            pos += 1
+            state = 'first_key'
+        elif state == 'colon':
+            if char != ':':
+                raise ValueError("Expecting ':' at {}".format(pos))
+            pos += 1
+            state = 'value'
+        elif state in ('first_key', 'next') and char == '}':
+            if state == 'next':
+                raise ValueError("Trailing ',' in JSON object")
+            pos += 1
+            state = 'end'
+        elif state == 'separator':
+            if char not in ',}':
+                raise ValueError("Expecting ',' at {}".format(pos))
+            pos += 1
+            state = 'next' if char == ',' else 'end'
+        else:
+            try:
+                value, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                end = None
+            if end is None or (end == len(buf) and not eof):
+                # The value may continue in the next chunk
+                chunk = f.read(chunk_size)
+                buf = buf[pos:] + chunk
+                pos = 0
+                eof = len(chunk) == 0
+                continue
+            pos = end
+            if state == 'value':
+                yield key, value
+                state = 'separator'
+            else:
+                key = value
+                state = 'colon'
+
+
+def getenv_int(name: str, default: int) -> int:
+    """ Integer value of an environment variable
+    """
+    try:
+        return int(getenv(name, default))
+    except ValueError:
+        return default
+
+
+class FileStorage():
+    """ Keep all objects of a class in a single JSON file,
+    rewritten entirely on every change
+
+    Writes are deferred inside begin()/commit() and, when
+    STORAGE_GROUP_COMMIT_MS or STORAGE_GROUP_COMMIT_WRITES is set,
+    flushed every N milliseconds or every M writes (and at least every
+    second when only M is set, to bound what a crash loses). STORAGE_FSYNC
+    controls durability: "commit" fsyncs on every flush, "periodic"
+    fsyncs from the background flusher only
+    """
+
+    def __init__(self, data: dict):
+        """ Initialize the engine on the in-memory objects
+        (class name -> {id: object})
+        """
+        self._data = data
+        self._lock = threading.RLock()
+        self._batch_depth = 0
+        self._pending = {}
+        self._pending_count = 0
+        self._unsynced = set()
+        self.group_commit_ms = getenv_int('STORAGE_GROUP_COMMIT_MS', 0)
+        self.group_commit_writes = getenv_int(
+                'STORAGE_GROUP_COMMIT_WRITES', 0)
+        self.fsync = getenv('STORAGE_FSYNC')
+
+        interval = self.group_commit_ms
+        if interval <= 0 and (self.fsync == 'periodic' or
+                              self.group_commit_writes > 0):
+            interval = 1000
+        if interval > 0:
+            threading.Thread(target=self._flusher, args=(interval,),
+                             daemon=True).start()
+        atexit.register(self.close)
+
+    def file_path(self, s_class: str) -> str:
+        """ Path of the JSON file of a class
+        """
+        return ".db_{}.json".format(s_class)
+
+    def load(self, s_class: str) -> Iterable[Tuple[str, dict]]:
+        """ Return all (id, JSON dict) stored for a class
+        """
+        self.flush()
+        return self._iter_snapshot(s_class)
+
+    def _iter_snapshot(self, s_class: str) -> Iterable[Tuple[str, dict]]:
+        """ Stream the (id, JSON dict) of the JSON file of a class
+        """
+        file_path = self.file_path(s_class)
+        if not path.exists(file_path):
+            return
+
+        with open(file_path, 'r') as f:
+            yield from iter_json_object(f)
+
+    def dump(self, s_class: str):
+        """ Write all objects of a class to its JSON file
+        """
+        with self._lock:
+            self._discard_pending(s_class)
+            objs = list(self._data.get(s_class, {}).items())
+            with open(self.file_path(s_class), 'w') as f:
+                self._write_snapshot(f, objs)
+                self._synced(self.file_path(s_class), f)
+
+    def put(self, s_class: str, obj):
+        """ Persist a created or updated object
+        """
+        self._write(s_class, None)
+
+    def delete(self, s_class: str, obj_id: str):
+        """ Persist the removal of an object
+        """
+        self._write(s_class, None)
+
+    def begin(self):
+        """ Start deferring writes until the matching commit()
+        """
+        with self._lock:
+            self._batch_depth += 1
+
+    def commit(self):
+        """ End a begin() block, flushing once the outermost one ends
+        """
+        with self._lock:
+            self._batch_depth -= 1
+            if not self._deferred():
+                self.flush()
+
+    def flush(self):
+        """ Write every pending change
+        """
+        with self._lock:
+            pending = self._pending
+            self._pending = {}
+            self._pending_count = 0
+            for s_class, records in pending.items():
+                self._flush(s_class, records)
+
+    def sync(self):
+        """ fsync the files written since the last sync
+        """
+        with self._lock:
+            file_paths = self._unsynced
+            self._unsynced = set()
+        for file_path in file_paths:
+            if not path.exists(file_path):
+                continue
+            with open(file_path, 'r') as f:
+                os.fsync(f.fileno())
+
+    def close(self):
+        """ Flush and sync everything still pending
+        """
+        self.flush()
+        self.sync()
+
+    def _write(self, s_class: str, record: dict):
+        """ Queue a change and flush it unless writes are deferred
+        """
+        with self._lock:
+            self._pending.setdefault(s_class, []).append(record)
+            self._pending_count += 1
+            if not self._deferred():
+                self.flush()
+
+    def _write_snapshot(self, f, objs: Iterable[Tuple]):
+        """ Write (id, object) pairs as one JSON object, serializing one
+        object at a time
+        """
+        f.write('{')
+        separator = ''
+        for obj_id, obj in objs:
+            f.write('{}{}: {}'.format(separator, json.dumps(obj_id),
+                                      json.dumps(obj.to_json(True))))
+            separator = ', '
+        f.write('}')
+
+    def _flush(self, s_class: str, records: list):
+        """ Write the pending changes of a class (lock must be held)
+        """
+        self.dump(s_class)
+
+    def _discard_pending(self, s_class: str):
+        """ Forget pending changes covered by a full dump
+        (lock must be held)
+        """
+        records = self._pending.pop(s_class, [])
+        self._pending_count -= len(records)
+
+    def _deferred(self) -> bool:
+        """ True if pending writes wait for commit() or group commit
+        """
+        if self._batch_depth > 0:
+            return True
+        if self.group_commit_writes > 0:
+            return self._pending_count < self.group_commit_writes
+        return self.group_commit_ms > 0
+
+    def _synced(self, file_path: str, f):
+        """ Apply the durability setting to a file just written
+        """
+        f.flush()
+        if self.fsync == 'commit':
+            os.fsync(f.fileno())
+        elif self.fsync == 'periodic':
+            self._unsynced.add(file_path)
+
+    def _flusher(self, interval: int):
+        """ Background group commit and periodic fsync
+        """
+        while True:
+            time.sleep(interval / 1000)
+            self.flush()
+            if self.fsync == 'periodic':
+                self.sync()
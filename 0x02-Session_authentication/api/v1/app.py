@@ -4,6 +4,8 @@ Route module for the API
 """
 from os import getenv
 from api.v1.views import app_views
+from api.v1.auth.auth import PathMatcher
+from api.v1.auth.context import AuthContext
 from flask import Flask, jsonify, abort, request
 from flask_cors import (CORS, cross_origin)
 import os
@@ -15,6 +17,16 @@ CORS(app, resources={r"/api/v1/*": {"origins": "*"}})
 
 auth = None
 
+# Public routes, plus the comma separated AUTH_EXCLUDED_PATHS ('*' at the
+# end of a path excludes every path starting with it)
+EXCLUDED_PATHS = PathMatcher([
+        '/api/v1/status/',
+        '/api/v1/unauthorized/',
+        '/api/v1/forbidden/',
+        '/api/v1/auth_session/login/'
+] + [path.strip() for path in getenv('AUTH_EXCLUDED_PATHS', '').split(',')
+     if path.strip()])
+
 # Based on the environment variable AUTH_TYPE, load and assign the right
 # instance of authentication to auth
 AUTH_TYPE = getenv('AUTH_TYPE')
@@ -63,28 +75,22 @@ def forbidden(error) -> str:
 @app.before_request
 def before_request():
     """ Method to handle before_request."""
+    request.current_user = None
     if auth is None:
         return
 
-    excluded_paths = [
-            '/api/v1/status/',
-            '/api/v1/unauthorized/',
-            '/api/v1/forbidden/',
-            '/api/v1/auth_session/login/'
-    ]
-
-    if not auth.require_auth(request.path, excluded_paths):
+    request.auth_context = AuthContext(auth, request)
+    if not auth.require_auth(request.path, EXCLUDED_PATHS):
         return
 
     if auth.authorization_header(request) is None and auth.session_cookie(
             request) is None:
         abort(401)
 
-    if auth.current_user(request) is None:
+    request.current_user = request.auth_context.user
+    if request.current_user is None:
         abort(403)
 
-    request.current_user = auth.current_user(request)
-
 
 if __name__ == "__main__":
     host = getenv("API_HOST", "0.0.0.0")
@@ -1,8 +1,51 @@
 #!/usr/bin/env python3
 """ A Method that creates a class Auth."""
 from flask import request
+from functools import lru_cache
 from typing import List, TypeVar
 import os
+import re
+
+
+class PathMatcher:
+    """ Excluded paths compiled once: exact paths are normalized with a
+    trailing slash into a set, paths ending with '*' are prefixes
+    matched by a single regex
+    """
+
+    def __init__(self, excluded_paths: List[str]):
+        """ Compile a list of excluded paths
+        """
+        self.paths = set()
+        prefixes = []
+        for excluded_path in excluded_paths:
+            if excluded_path.endswith('*'):
+                prefixes.append(re.escape(excluded_path[:-1]))
+            elif excluded_path.endswith('/'):
+                self.paths.add(excluded_path)
+            else:
+                self.paths.add(excluded_path + '/')
+        self.prefixes = None
+        if prefixes:
+            self.prefixes = re.compile('|'.join(prefixes))
+
+    def match(self, path: str) -> bool:
+        """ True if path is excluded
+        """
+        # Normalize path to ensure it ends with a slash
+        if not path.endswith('/'):
+            path += '/'
+        if path in self.paths:
+            return True
+        return self.prefixes is not None and \
+            self.prefixes.match(path) is not None
+
+
+@lru_cache(maxsize=32)
+def compile_paths(excluded_paths: tuple) -> PathMatcher:
+    """ PathMatcher of a list of excluded paths, compiled once
+    """
+    return PathMatcher(excluded_paths)
 
 
 class Auth:
@@ -12,34 +55,18 @@ class Auth:
         """ method to require authentication
         Args:
             path - string
-            excluded_paths: List of strings
+            excluded_paths: List of strings, or a PathMatcher
         Returns:
             True if path requires authentication, False otherwise
         """
         if path is None:
             return True
-        if excluded_paths is None or not excluded_paths:
+        if excluded_paths is None:
             return True
+        if not isinstance(excluded_paths, PathMatcher):
+            excluded_paths = compile_paths(tuple(excluded_paths))
 
-        # Normalize path to ensure it ends with a slash
-        if not path.endswith('/'):
-            path += '/'
-
-        # Check if normalized path is in excluded_paths
-        for excluded_path in excluded_paths:
-
-            # Handle wildcard '*' at the end of excluded_path
-            if excluded_path.endswith('*'):
-                if path.startswith(excluded_path[:-1]):
-                    return False
-            else:
-                if not excluded_path.endswith('/'):
-                    excluded_path += '/'
-
-                if path == excluded_path:
-                    return False
-
-        return True
+        return not excluded_paths.match(path)
 
     def authorization_header(self, request=None) -> str:
         """ Method to handle authorization header
@@ -2,7 +2,11 @@
 """ A new class that inherits
 """
 from api.v1.auth.auth import Auth
+from api.v1.auth.cache import LRUCache
 import base64
+import hmac
+import os
+import secrets
 from typing import TypeVar
 from models.user import User
 
@@ -11,6 +15,21 @@ class BasicAuth(Auth):
     """ class that inherits from Auth
     """
 
+    def __init__(self):
+        """ Initialize the cache of verified Authorization headers
+        (BASIC_AUTH_CACHE_SIZE entries, 0 to disable, kept for
+        BASIC_AUTH_CACHE_TTL seconds)
+        """
+        super().__init__()
+        try:
+            size = int(os.getenv("BASIC_AUTH_CACHE_SIZE", 1024))
+            ttl = int(os.getenv("BASIC_AUTH_CACHE_TTL", 60))
+        except ValueError:
+            size, ttl = 1024, 60
+        self.credential_cache = LRUCache(size, ttl)
+        # Headers are only kept as keyed digests, never in clear
+        self._cache_key = secrets.token_bytes(32)
+
     def extract_base64_authorization_header(
             self, authorization_header: str) -> str:
         """ A method that returns Base64 part of the
@@ -84,6 +103,25 @@ class BasicAuth(Auth):
             # Catch any unexpected exceptions and return None
             return None
 
+    def cached_user(self, digest: bytes) -> TypeVar('User'):
+        """ Method that returns the User cached for a header digest,
+        if the User still exists with the same email and password
+        """
+        entry = self.credential_cache.get(digest)
+        if entry is None:
+            return None
+
+        user_id, email, password = entry
+        try:
+            user = User.get(user_id)
+        except Exception:
+            user = None
+        if user is None or user.email != email or \
+                user.password != password:
+            self.credential_cache.pop(digest)
+            return None
+        return user
+
     def current_user(self, request=None) -> TypeVar('User'):
         """ method that overloads and retrieves User instance
         for a request
@@ -92,6 +130,12 @@ class BasicAuth(Auth):
         if auth_header is None:
             return None
 
+        digest = hmac.new(self._cache_key, auth_header.encode('utf-8'),
+                          'sha256').digest()
+        user = self.cached_user(digest)
+        if user is not None:
+            return user
+
         base64_header = self.extract_base64_authorization_header(auth_header)
         if base64_header is None:
             return None
@@ -104,4 +148,8 @@ class BasicAuth(Auth):
         if user_email is None or user_pwd is None:
             return None
 
-        return self.user_object_from_credentials(user_email, user_pwd)
+        user = self.user_object_from_credentials(user_email, user_pwd)
+        if user is not None:
+            self.credential_cache.set(
+                    digest, (user.id, user.email, user.password))
+        return user
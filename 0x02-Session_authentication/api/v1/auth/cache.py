@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+""" Bounded LRU cache with time-to-live
+"""
+from collections import OrderedDict
+import threading
+import time
+
+
+class LRUCache():
+    """ Keep up to maxsize entries for ttl seconds each, evicting the
+    least recently used entry first
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60):
+        """ Initialize an empty cache
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """ Return the live value of a key, or default
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        """ Store a value for a key
+        """
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def pop(self, key, default=None):
+        """ Remove a key, returning its value or default
+        """
+        with self._lock:
+            entry = self._entries.pop(key, None)
+        return default if entry is None else entry[1]
+
+    def __len__(self) -> int:
+        """ Number of entries, expired ones included
+        """
+        return len(self._entries)
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+""" Per-request authentication context
+"""
+from typing import TypeVar
+
+
+class AuthContext():
+    """ Authentication state of one request: the principal is resolved
+    by the auth backend at most once and shared by before_request and
+    the views
+    """
+
+    def __init__(self, auth, request):
+        """ Initialize the context of a request
+        """
+        self.auth = auth
+        self.request = request
+        self._user = None
+        self._resolved = False
+        self._session_id = None
+
+    @property
+    def user(self) -> TypeVar('User'):
+        """ Current user of the request, or None
+        """
+        if not self._resolved:
+            self._user = self.auth.current_user(self.request)
+            self._resolved = True
+        return self._user
+
+    @property
+    def session_id(self) -> str:
+        """ Session cookie value of the request, or None
+        """
+        if self._session_id is None:
+            self._session_id = self.auth.session_cookie(self.request)
+        return self._session_id
@@ -2,6 +2,7 @@
 """ class that inherits from Auth
 """
 from api.v1.auth.auth import Auth
+from api.v1.auth.session_store import get_session_store
 import uuid
 from models.user import User
 
@@ -9,7 +10,8 @@ from models.user import User
 class SessionAuth(Auth):
     """ SessionAuth that inherits from Auth
     """
-    user_id_by_session_id = {}
+    # Shared by all server processes when SESSION_STORE=sqlite
+    user_id_by_session_id = get_session_store()
 
     def create_session(self, user_id: str = None) -> str:
         """ Method that creates a Session ID for user_id
@@ -55,5 +57,14 @@ class SessionAuth(Auth):
         if user_id is None:
             return False
 
-        del self.user_id_by_session_id[session_id]
+        return self.destroy_session_id(session_id)
+
+    def destroy_session_id(self, session_id: str) -> bool:
+        """ Destroy a session ID already resolved (e.g. by the request's
+        AuthContext), without looking its user up again
+        """
+        try:
+            del self.user_id_by_session_id[session_id]
+        except KeyError:
+            return False
         return True
@@ -5,12 +5,14 @@ from api.v1.auth.session_exp_auth import SessionExpAuth
 from models.user_session import UserSession
 from flask import request
 import os
+import time
 from datetime import datetime, timedelta
 
 
 class SessionDBAuth(SessionExpAuth):
     """ Session database class
     """
+    last_purge = None
 
     def create_session(self, user_id=None):
         """ Create and store a new UserSession instance """
@@ -42,7 +44,7 @@ class SessionDBAuth(SessionExpAuth):
 
             expiration_time = created_at + timedelta(
                     seconds=self.session_duration)
-            if datetime.now() > expiration_time:
+            if datetime.utcnow() > expiration_time:
                 return None
 
             return user_session.user_id
@@ -60,6 +62,11 @@ class SessionDBAuth(SessionExpAuth):
         if session_id is None:
             return False
 
+        return self.destroy_session_id(session_id)
+
+    def destroy_session_id(self, session_id: str) -> bool:
+        """ Remove the UserSession of a session ID from the database
+        """
         user_sessions = UserSession.search({'session_id': session_id})
         if not user_sessions:
             return False
@@ -67,3 +74,33 @@ class SessionDBAuth(SessionExpAuth):
         user_session = user_sessions[0]
         user_session.remove()  # Remove the session from the database
         return True
+
+    def reap_expired_sessions(self) -> int:
+        """ Remove the expired UserSession objects, persisted in a single
+        write, along with the expired in-memory sessions
+        Return the number of UserSession objects removed
+        """
+        super().reap_expired_sessions()
+        start = time.time()
+        # created_at of the models is in UTC
+        expired_before = datetime.utcnow() - timedelta(
+                seconds=self.session_duration)
+        expired = UserSession.created_before(expired_before)
+        with UserSession.batch():
+            for user_session in expired:
+                user_session.remove()
+
+        self.last_purge = {
+                'purged': len(expired),
+                'seconds': round(time.time() - start, 6)
+        }
+        return len(expired)
+
+    def session_stats(self) -> dict:
+        """ Number of stored UserSession objects and result of the
+        last expiry sweep
+        """
+        stats = super().session_stats()
+        stats['user_sessions'] = UserSession.count()
+        stats['last_purge'] = self.last_purge
+        return stats
@@ -4,6 +4,8 @@
 import os
 from api.v1.auth.session_auth import SessionAuth
 from datetime import datetime, timedelta
+import threading
+import time
 
 
 class SessionExpAuth(SessionAuth):
@@ -17,6 +19,49 @@ class SessionExpAuth(SessionAuth):
             self.session_duration = int(os.getenv("SESSION_DURATION", 0))
         except ValueError:
             self.session_duration = 0
+        self.expired_sessions = 0
+        if self.session_duration > 0:
+            self.start_reaper()
+
+    def start_reaper(self):
+        """ Start the thread removing expired sessions every
+        SESSION_REAP_INTERVAL seconds (default: the session duration,
+        at most 60)
+        """
+        try:
+            interval = int(os.getenv("SESSION_REAP_INTERVAL", 0))
+        except ValueError:
+            interval = 0
+        if interval <= 0:
+            interval = min(self.session_duration, 60)
+
+        def reap():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.reap_expired_sessions()
+                except Exception:
+                    pass
+
+        threading.Thread(target=reap, daemon=True).start()
+
+    def reap_expired_sessions(self) -> int:
+        """ Remove the expired sessions
+        Return the number of sessions removed
+        """
+        expired_before = datetime.now() - timedelta(
+                seconds=self.session_duration)
+        count = self.user_id_by_session_id.expire(expired_before)
+        self.expired_sessions += count
+        return count
+
+    def session_stats(self) -> dict:
+        """ Number of live sessions and of sessions expired so far
+        """
+        return {
+                'live': len(self.user_id_by_session_id),
+                'expired': self.expired_sessions
+        }
 
     def create_session(self, user_id=None):
         """ Creates a session with expiration
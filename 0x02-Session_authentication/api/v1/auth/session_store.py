@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+""" Session stores used by SessionAuth to map session IDs to users
+"""
+from datetime import datetime
+from os import getenv
+import heapq
+import os
+import sqlite3
+import threading
+
+
+class MemorySessionStore(dict):
+    """ Sessions kept in a dict of the current process
+
+    Sessions stored with a 'created_at' are also pushed on a heap
+    ordered by creation time, so expire() only visits expired ones
+    """
+
+    def __init__(self):
+        """ Initialize an empty store
+        """
+        super().__init__()
+        self._heap = []
+        self._lock = threading.Lock()
+
+    def __setitem__(self, session_id: str, value):
+        """ Store a session
+        """
+        with self._lock:
+            super().__setitem__(session_id, value)
+            if isinstance(value, dict) and \
+                    value.get('created_at') is not None:
+                heapq.heappush(self._heap,
+                               (value.get('created_at'), session_id))
+
+    def __delitem__(self, session_id: str):
+        """ Remove a session
+        """
+        with self._lock:
+            super().__delitem__(session_id)
+
+    def expire(self, before: datetime) -> int:
+        """ Remove the sessions created before a time
+        Return the number of sessions removed
+        """
+        count = 0
+        with self._lock:
+            while self._heap and self._heap[0][0] < before:
+                created_at, session_id = heapq.heappop(self._heap)
+                value = super().get(session_id)
+                # Skip heap entries of sessions since removed or replaced
+                if not isinstance(value, dict) or \
+                        value.get('created_at') != created_at:
+                    continue
+                super().__delitem__(session_id)
+                count += 1
+        return count
+
+
+class SQLiteSessionStore():
+    """ Sessions kept in a SQLite database in WAL mode, shared by every
+    process of the server opening the same file
+
+    Values are either a user ID or a dict with 'user_id' and
+    'created_at', as stored by SessionAuth and SessionExpAuth
+    """
+
+    def __init__(self, file_path: str):
+        """ Initialize the store and create its table
+        """
+        self.file_path = file_path
+        self._local = threading.local()
+        with self._connection() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS sessions ("
+                         "session_id TEXT PRIMARY KEY, "
+                         "user_id TEXT NOT NULL, "
+                         "created_at REAL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS sessions_created_at "
+                         "ON sessions (created_at)")
+
+    def _connection(self) -> sqlite3.Connection:
+        """ Connection of the current thread, reopened after a fork
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.file_path, timeout=5,
+                                   isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def __setitem__(self, session_id: str, value):
+        """ Store the user ID (and creation time) of a session
+        """
+        created_at = None
+        user_id = value
+        if isinstance(value, dict):
+            user_id = value.get('user_id')
+            if value.get('created_at') is not None:
+                created_at = value.get('created_at').timestamp()
+        self._connection().execute(
+            "INSERT OR REPLACE INTO sessions VALUES (?, ?, ?)",
+            (session_id, user_id, created_at))
+
+    def get(self, session_id: str, default=None):
+        """ Return the value stored for a session ID, or default
+        """
+        row = self._connection().execute(
+            "SELECT user_id, created_at FROM sessions "
+            "WHERE session_id = ?", (session_id,)).fetchone()
+        if row is None:
+            return default
+        user_id, created_at = row
+        if created_at is None:
+            return user_id
+        return {'user_id': user_id,
+                'created_at': datetime.fromtimestamp(created_at)}
+
+    def __getitem__(self, session_id: str):
+        """ Return the value stored for a session ID
+        """
+        value = self.get(session_id)
+        if value is None:
+            raise KeyError(session_id)
+        return value
+
+    def __delitem__(self, session_id: str):
+        """ Remove a session
+        """
+        cursor = self._connection().execute(
+            "DELETE FROM sessions WHERE session_id = ?", (session_id,))
+        if cursor.rowcount == 0:
+            raise KeyError(session_id)
+
+    def __contains__(self, session_id: str) -> bool:
+        """ True if the session ID is stored
+        """
+        return self.get(session_id) is not None
+
+    def __len__(self) -> int:
+        """ Number of stored sessions
+        """
+        return self._connection().execute(
+            "SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    def expire(self, before: datetime) -> int:
+        """ Remove the sessions created before a time, using the index
+        on created_at
+        Return the number of sessions removed
+        """
+        return self._connection().execute(
+            "DELETE FROM sessions WHERE created_at < ?",
+            (before.timestamp(),)).rowcount
+
+
+def get_session_store():
+    """ Return the session store selected by SESSION_STORE:
+    memory (default) or sqlite, at SESSION_STORE_PATH
+    """
+    if getenv('SESSION_STORE') == 'sqlite':
+        return SQLiteSessionStore(
+            getenv('SESSION_STORE_PATH', '.db_sessions.sqlite'))
+    return MemorySessionStore()
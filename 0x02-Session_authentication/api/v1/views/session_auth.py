@@ -45,6 +45,7 @@ def logout():
     """ Handles the logout process for session authentication
     """
     from api.v1.app import auth
-    if not auth.destroy_session(request):
+    # before_request already resolved the session and its user
+    if not auth.destroy_session_id(request.auth_context.session_id):
         abort(404)
     return jsonify({})
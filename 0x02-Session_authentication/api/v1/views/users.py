@@ -2,18 +2,108 @@
 """ Module of Users views
 """
 from api.v1.views import app_views
-from flask import abort, jsonify, request
+from flask import abort, jsonify, request, Response, stream_with_context
 from models.user import User
+from urllib.parse import urlencode
+import json
+
+
+STREAM_CHUNK_SIZE = 500
+FILTER_FIELDS = ('email', 'first_name', 'last_name')
+
+
+def requested_fields() -> set:
+    """ Fields listed in the fields query parameter, None for all
+    """
+    fields = request.args.get('fields')
+    if fields is None:
+        return None
+    return {field.strip() for field in fields.split(',')}
+
+
+def select_users(filters: dict, after: str = None, limit: int = None):
+    """ Return up to limit users in ID order after a cursor, matching
+    all filters
+    """
+    if not filters:
+        return User.page(after, limit)
+
+    users = sorted(User.search(filters), key=lambda user: user.id)
+    if after is not None:
+        users = [user for user in users if user.id > after]
+    return users if limit is None else users[:limit]
+
+
+def iter_users(filters: dict, after: str = None):
+    """ Generate the users after a cursor in ID order, matching all
+    filters: unfiltered users are read page by page, filtered ones
+    are searched and sorted once
+    """
+    if filters:
+        yield from select_users(filters, after)
+        return
+    while True:
+        users = User.page(after, STREAM_CHUNK_SIZE)
+        yield from users
+        if len(users) < STREAM_CHUNK_SIZE:
+            return
+        after = users[-1].id
+
+
+def stream_users(filters: dict, after: str = None, fields: set = None):
+    """ Generate the JSON list of the users after a cursor, in ID order
+    """
+    yield '['
+    separator = ''
+    for user in iter_users(filters, after):
+        yield separator + json.dumps(user.to_json(fields=fields))
+        separator = ','
+    yield ']'
 
 
 @app_views.route('/users', methods=['GET'], strict_slashes=False)
 def view_all_users() -> str:
     """ GET /api/v1/users
+    Query parameters (optional):
+      - limit: maximum number of users returned
+      - after: return the users following this User ID
+      - stream: if 1, send the list as a chunked response
+      - fields: comma separated list of the fields to return
+      - email, first_name, last_name: only return matching users
     Return:
-      - list of all User objects JSON represented
+      - list of User objects JSON represented, in User ID order when
+        paginated or filtered, with a Link header to the next page
+      - 400 if limit is not a positive integer
     """
-    all_users = [user.to_json() for user in User.all()]
-    return jsonify(all_users)
+    after = request.args.get('after')
+    limit = request.args.get('limit')
+    fields = requested_fields()
+    filters = {key: request.args.get(key) for key in FILTER_FIELDS
+               if key in request.args}
+    if request.args.get('stream') == '1':
+        return Response(
+            stream_with_context(stream_users(filters, after, fields)),
+            mimetype='application/json')
+    if limit is None and after is None and not filters:
+        all_users = [user.to_json(fields=fields) for user in User.all()]
+        return jsonify(all_users)
+
+    if limit is not None:
+        try:
+            limit = int(limit)
+        except ValueError:
+            limit = 0
+        if limit <= 0:
+            return jsonify({'error': "limit must be a positive integer"}), 400
+    users = select_users(filters, after, limit)
+    response = jsonify([user.to_json(fields=fields) for user in users])
+    if limit is not None and len(users) == limit:
+        next_page = dict(filters, limit=limit, after=users[-1].id)
+        if fields is not None:
+            next_page['fields'] = request.args.get('fields')
+        response.headers['Link'] = '<{}?{}>; rel="next"'.format(
+            request.base_url, urlencode(next_page))
+    return response
 
 
 @app_views.route('/users/<user_id>', methods=['GET'], strict_slashes=False)
@@ -21,20 +111,23 @@ def view_one_user(user_id: str = None) -> str:
     """ GET /api/v1/users/:id
     Path parameter:
       - User ID
+    Query parameter (optional):
+      - fields: comma separated list of the fields to return
     Return:
       - User object JSON represented
       - 404 if the User ID doesn't exist
     """
+    fields = requested_fields()
     if user_id == "me":
         if request.current_user is None:
             abort(404)
         else:
-            return jsonify(request.current_user.to_json())
+            return jsonify(request.current_user.to_json(fields=fields))
     else:
         user = User.get(user_id)
         if user is None:
             abort(404)
-        return jsonify(user.to_json())
+        return jsonify(user.to_json(fields=fields))
 
 
 @app_views.route('/users/<user_id>', methods=['DELETE'], strict_slashes=False)
@@ -129,6 +222,8 @@ def update_user(user_id: str = None) -> str:
 @app_views.route('/users/me', methods=['GET'], strict_slashes=False)
 def get_current_user() -> str:
     """ GET /api/v1/users/me
+    Query parameter (optional):
+      - fields: comma separated list of the fields to return
     Return:
       - User object JSON represented
       - 404 if the User ID doesn't exist
@@ -136,4 +231,4 @@ def get_current_user() -> str:
     user = getattr(request, 'current_user', None)
     if user is None:
         abort(404)
-    return jsonify(user.to_json())
+    return jsonify(user.to_json(fields=requested_fields()))
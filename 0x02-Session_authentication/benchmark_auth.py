@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+""" Benchmark of the per-request authentication cost: the principal
+resolved twice (the former before_request) against once through the
+request's AuthContext, for Basic and database-backed session auth
+(the Basic auth credential cache is off unless BASIC_AUTH_CACHE_SIZE
+is set)
+
+./benchmark_auth.py [users] [requests]
+"""
+import base64
+import os
+import sys
+import tempfile
+import time
+
+os.chdir(tempfile.mkdtemp())
+os.environ.setdefault('BASIC_AUTH_CACHE_SIZE', '0')
+
+from flask import Request  # noqa: E402
+from werkzeug.test import EnvironBuilder  # noqa: E402
+from api.v1.auth.basic_auth import BasicAuth  # noqa: E402
+from api.v1.auth.context import AuthContext  # noqa: E402
+from api.v1.auth.session_db_auth import SessionDBAuth  # noqa: E402
+from models.user import User  # noqa: E402
+
+
+def resolve_twice(auth, request) -> None:
+    """ Former before_request: one lookup for the 403 check and one
+    for request.current_user
+    """
+    if auth.current_user(request) is None:
+        raise ValueError("unauthenticated")
+    auth.current_user(request)
+
+
+def resolve_once(auth, request) -> None:
+    """ before_request and the view sharing an AuthContext
+    """
+    context = AuthContext(auth, request)
+    if context.user is None:
+        raise ValueError("unauthenticated")
+    context.user
+
+
+def measure(auth, requests: list, resolve) -> float:
+    """ Mean microseconds per request of a resolve function
+    """
+    start = time.perf_counter()
+    for request in requests:
+        resolve(auth, request)
+    return (time.perf_counter() - start) * 1e6 / len(requests)
+
+
+def make_request(headers: dict) -> Request:
+    """ Request object carrying the given headers
+    """
+    return Request(EnvironBuilder(headers=headers).get_environ())
+
+
+if __name__ == "__main__":
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    requests = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    session_auth = SessionDBAuth()
+    basic_headers = []
+    session_headers = []
+    with User.batch():
+        for i in range(users):
+            user = User(email="user{}@bench.test".format(i))
+            user.password = "pwd{}".format(i)
+            user.save()
+            credentials = base64.b64encode("user{}@bench.test:pwd{}".format(
+                i, i).encode('utf-8')).decode('ascii')
+            basic_headers.append({"Authorization": "Basic " + credentials})
+            session_headers.append({"Cookie": "{}={}".format(
+                os.getenv("SESSION_NAME", "_my_session_id"),
+                session_auth.create_session(user.id))})
+
+    print("backend            twice (us)  once (us)  speedup")
+    for name, auth, headers in (("basic_auth", BasicAuth(), basic_headers),
+                                ("session_db_auth", session_auth,
+                                 session_headers)):
+        sample = [make_request(headers[i % users]) for i in range(requests)]
+        twice = measure(auth, sample, resolve_twice)
+        once = measure(auth, sample, resolve_once)
+        print("{:<18} {:>11.1f} {:>10.1f} {:>8.2f}x".format(
+            name, twice, once, twice / once))
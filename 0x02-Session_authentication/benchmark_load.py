@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+""" Benchmark of User.load_from_file(): startup time and peak RSS of
+the former json.load loader against the streaming loader, eager and
+lazy, each followed by one email search, in a fresh process
+Every loader builds the same DATA, indexes and orders
+
+./benchmark_load.py [users]
+"""
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+MODES = ("json.load", "streaming", "lazy")
+
+
+def generate(users: int) -> None:
+    """ Write a .db_User.json of users in the current directory
+    """
+    from models.user import User
+
+    template = User(email="template@bench.test", first_name="Bench",
+                    last_name="User")
+    template.password = "password"
+    record = template.to_json(True)
+    with open(".db_User.json", "w") as f:
+        separator = '{'
+        for i in range(users):
+            record["id"] = str(uuid.uuid4())
+            record["email"] = "user{}@bench.test".format(i)
+            f.write('{}{}: {}'.format(separator, json.dumps(record["id"]),
+                                      json.dumps(record)))
+            separator = ', '
+        f.write('}' if users else '{}')
+
+
+def load(mode: str, email: str) -> None:
+    """ Load the users with a loader mode and search one of them
+    """
+    from models.base import CREATED_ORDER, DATA, ORDERED_IDS
+    from models.user import User
+
+    if mode == "json.load":
+        with open(".db_User.json") as f:
+            objs_json = json.load(f)
+        DATA["User"] = {}
+        User._reset_indexes()
+        for obj_id, obj_json in objs_json.items():
+            obj = User(**obj_json)
+            DATA["User"][obj_id] = obj
+            User._index(obj_id, obj, check_unique=False)
+        ORDERED_IDS["User"] = sorted(DATA["User"])
+        if User.ordered_by_creation:
+            CREATED_ORDER["User"] = sorted(
+                    (User._created_at(obj), obj_id)
+                    for obj_id, obj in DATA["User"].items())
+    else:
+        User.load_from_file(lazy=(mode == "lazy"))
+    assert len(User.search({"email": email})) == 1
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] == "--child":
+        start = time.perf_counter()
+        load(sys.argv[2], sys.argv[3])
+        print(time.perf_counter() - start,
+              resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+        sys.exit(0)
+
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    script = os.path.abspath(__file__)
+    os.chdir(tempfile.mkdtemp())
+    generate(users)
+    size = os.path.getsize(".db_User.json") / (1 << 20)
+    print("{} users, {:.0f}MB .db_User.json".format(users, size))
+    print("loader        time (s)  peak RSS (MB)")
+    for mode in MODES:
+        output = subprocess.run(
+            [sys.executable, script, "--child", mode,
+             "user{}@bench.test".format(users // 2)],
+            check=True, stdout=subprocess.PIPE,
+            universal_newlines=True).stdout.split()
+        print("{:<12} {:>9.2f} {:>14.0f}".format(
+            mode, float(output[0]), int(output[1]) / 1024))
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+""" Microbenchmark of the timestamp codec against strptime/strftime,
+and of User loading and serialization built on it
+
+./benchmark_timestamps.py [calls] [users]
+"""
+from datetime import datetime, timedelta
+import sys
+import time
+from models import timestamp
+from models.timestamp import TIMESTAMP_FORMAT
+from models.user import User
+
+
+def timed(function, values) -> float:
+    """ Seconds taken to call function on every value
+    """
+    start = time.perf_counter()
+    for value in values:
+        function(value)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    users = int(sys.argv[2]) if len(sys.argv) > 2 else 50000
+    now = datetime.utcnow().replace(microsecond=0)
+    datetimes = [now - timedelta(seconds=i) for i in range(calls)]
+    strings = [value.strftime(TIMESTAMP_FORMAT) for value in datetimes]
+
+    print("{} calls                     seconds".format(calls))
+    print("strptime                    {:>8.3f}".format(timed(
+        lambda value: datetime.strptime(value, TIMESTAMP_FORMAT), strings)))
+    print("timestamp.parse             {:>8.3f}".format(
+        timed(timestamp.parse, strings)))
+    print("strftime                    {:>8.3f}".format(timed(
+        lambda value: value.strftime(TIMESTAMP_FORMAT), datetimes)))
+    timestamp.to_string.cache_clear()
+    print("timestamp.to_string         {:>8.3f}".format(
+        timed(timestamp.to_string, datetimes)))
+    print("timestamp.to_string cached  {:>8.3f}".format(
+        timed(timestamp.to_string, [now] * calls)))
+    print("timestamp.to_epoch          {:>8.3f}".format(
+        timed(timestamp.to_epoch, datetimes)))
+
+    records = [User(email="user{}@bench.test".format(i),
+                    created_at=strings[i % calls],
+                    updated_at=strings[i % calls]).to_json(True)
+               for i in range(users)]
+    print("\n{} users                    seconds".format(users))
+    start = time.perf_counter()
+    objs = [User(**record) for record in records]
+    print("User(**json)                {:>8.3f}".format(
+        time.perf_counter() - start))
+    print("to_json(True)               {:>8.3f}".format(
+        timed(lambda user: user.to_json(True), objs)))
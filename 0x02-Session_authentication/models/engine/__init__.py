@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+""" Storage engines used by models.base to persist objects
+
+An engine exposes:
+    - load(s_class): stream of (id, JSON dict) stored for a class,
+      where a later record of an ID replaces the earlier one and
+      (id, None) means the object was removed
+    - put(s_class, obj): persist one created/updated object
+    - delete(s_class, obj_id): persist the removal of one object
+    - dump(s_class): write every object of a class at once
+"""
+from os import getenv
+from models.engine.file_storage import FileStorage
+from models.engine.log_storage import LogStorage
+
+
+STORAGE_ENGINES = {
+    'file': FileStorage,
+    'log': LogStorage,
+}
+
+
+def get_storage(data: dict) -> FileStorage:
+    """ Return the storage engine selected by STORAGE_ENGINE
+    (default: file) for the in-memory objects in data
+    """
+    engine = STORAGE_ENGINES.get(getenv('STORAGE_ENGINE', 'file'))
+    if engine is None:
+        engine = FileStorage
+    return engine(data)
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+""" LogStorage module
+"""
+from models.engine.file_storage import FileStorage, getenv_int
+from typing import Iterable, Tuple
+from os import path
+import json
+import os
+import threading
+
+
+class LogStorage(FileStorage):
+    """ Append one put/delete record per change to .db_<Class>.log
+
+    The JSON file of FileStorage is used as snapshot: loading replays
+    the log over it, and once the log holds more records than the
+    snapshot (and at least STORAGE_COMPACT_THRESHOLD) it is compacted
+    into a new snapshot by a background thread
+    """
+
+    def __init__(self, data: dict):
+        """ Initialize the engine
+        """
+        super().__init__(data)
+        self.compact_threshold = getenv_int('STORAGE_COMPACT_THRESHOLD',
+                                            1000)
+        self._compacting = {}
+        self._logs = {}
+        self._log_size = {}
+        self._snapshot_size = {}
+
+    def log_path(self, s_class: str) -> str:
+        """ Path of the log of a class
+        """
+        return ".db_{}.log".format(s_class)
+
+    def compacting_log_path(self, s_class: str) -> str:
+        """ Path of the log being folded into the snapshot
+        """
+        return ".db_{}.log.compacting".format(s_class)
+
+    def _replay(self, s_class: str,
+                log_paths: list) -> Iterable[Tuple[str, dict]]:
+        """ Stream the snapshot of a class followed by the records of
+        the logs, a removed object being yielded as (id, None)
+        """
+        yield from self._iter_snapshot(s_class)
+        for log_path in log_paths:
+            if not path.exists(log_path):
+                continue
+            with open(log_path, 'r') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # Partial record of an interrupted write
+                        break
+                    yield record['id'], record.get('obj')
+
+    def load(self, s_class: str) -> Iterable[Tuple[str, dict]]:
+        """ Stream all (id, JSON dict) stored for a class, followed by
+        the logged changes: later records of an ID replace the earlier
+        ones and (id, None) means the object was removed
+        """
+        self.flush()
+        with self._compaction_lock(s_class):
+            count = 0
+            for obj_id, obj_json in self._replay(s_class, [
+                    self.compacting_log_path(s_class),
+                    self.log_path(s_class)]):
+                count += 1
+                yield obj_id, obj_json
+            with self._lock:
+                self._snapshot_size[s_class] = count
+                self._log_size[s_class] = 0
+
+    def dump(self, s_class: str):
+        """ Write a snapshot of all objects of a class and empty its log
+        """
+        with self._compaction_lock(s_class):
+            with self._lock:
+                super().dump(s_class)
+                self._close_log(s_class)
+                for log_path in [self.log_path(s_class),
+                                 self.compacting_log_path(s_class)]:
+                    if path.exists(log_path):
+                        os.remove(log_path)
+                self._snapshot_size[s_class] = len(
+                        self._data.get(s_class, {}))
+                self._log_size[s_class] = 0
+
+    def put(self, s_class: str, obj):
+        """ Append the new state of an object to the log
+        """
+        self._write(s_class, json.dumps({'op': 'put', 'id': obj.id,
+                                         'obj': obj.to_json(True)}))
+
+    def delete(self, s_class: str, obj_id: str):
+        """ Append the removal of an object to the log
+        """
+        self._write(s_class, json.dumps({'op': 'delete', 'id': obj_id}))
+
+    def _flush(self, s_class: str, records: list):
+        """ Append the pending records of a class to its log in one
+        write (lock must be held)
+        """
+        log = self._logs.get(s_class)
+        if log is None:
+            log = open(self.log_path(s_class), 'a')
+            self._logs[s_class] = log
+        log.write(''.join(record + '\n' for record in records))
+        self._synced(self.log_path(s_class), log)
+        self._log_size[s_class] = self._log_size.get(s_class, 0) + \
+            len(records)
+        if self._log_size[s_class] >= max(
+                self.compact_threshold, self._snapshot_size.get(s_class, 0)):
+            self._start_compaction(s_class)
+
+    def _close_log(self, s_class: str):
+        """ Close the open log file of a class (lock must be held)
+        """
+        log = self._logs.pop(s_class, None)
+        if log is not None:
+            log.close()
+
+    def _compaction_lock(self, s_class: str) -> threading.Lock:
+        """ Lock held while the snapshot of a class is rewritten
+        """
+        with self._lock:
+            return self._compacting.setdefault(s_class, threading.Lock())
+
+    def _start_compaction(self, s_class: str):
+        """ Fold the current log into the snapshot in the background
+        """
+        lock = self._compaction_lock(s_class)
+        if not lock.acquire(blocking=False):
+            return
+
+        compacting_log_path = self.compacting_log_path(s_class)
+        with self._lock:
+            self._close_log(s_class)
+            if not path.exists(compacting_log_path) and \
+                    path.exists(self.log_path(s_class)):
+                os.replace(self.log_path(s_class), compacting_log_path)
+            self._log_size[s_class] = 0
+
+        def compact():
+            try:
+                objs_json = {}
+                for obj_id, obj_json in self._replay(
+                        s_class, [compacting_log_path]):
+                    if obj_json is None:
+                        objs_json.pop(obj_id, None)
+                    else:
+                        objs_json[obj_id] = obj_json
+                tmp_path = self.file_path(s_class) + '.tmp'
+                with open(tmp_path, 'w') as f:
+                    self._write_snapshot(f, objs_json.items())
+                os.replace(tmp_path, self.file_path(s_class))
+                if path.exists(compacting_log_path):
+                    os.remove(compacting_log_path)
+                with self._lock:
+                    self._snapshot_size[s_class] = len(objs_json)
+            finally:
+                lock.release()
+
+        threading.Thread(target=compact, daemon=True).start()
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+""" Timestamp codec shared by all models
+"""
+from datetime import datetime, timedelta
+from functools import lru_cache
+from os import getenv
+
+
+TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S"
+EPOCH = datetime(1970, 1, 1)
+ONE_SECOND = timedelta(seconds=1)
+
+
+def parse(value) -> datetime:
+    """ Return the datetime of a stored timestamp: a TIMESTAMP_FORMAT
+    string or a number of seconds since the epoch
+    """
+    if isinstance(value, (int, float)):
+        return EPOCH + timedelta(seconds=value)
+    return datetime.fromisoformat(value)
+
+
+@lru_cache(maxsize=1 << 16)
+def to_string(value: datetime) -> str:
+    """ Return a datetime formatted with TIMESTAMP_FORMAT
+    The cache is keyed on the value, so a new updated_at is
+    formatted again while unchanged timestamps are not
+    """
+    return value.isoformat(sep='T', timespec='seconds')
+
+
+def to_epoch(value: datetime) -> int:
+    """ Return a datetime as whole seconds since the epoch
+    """
+    return (value - EPOCH) // ONE_SECOND
+
+
+# Timestamps are written to storage as TIMESTAMP_FORMAT strings, or as
+# integers when STORAGE_TIMESTAMPS=epoch (both are read back by parse)
+serialize = to_epoch if getenv('STORAGE_TIMESTAMPS') == 'epoch' \
+    else to_string
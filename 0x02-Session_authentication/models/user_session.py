@@ -7,6 +7,9 @@ from models.base import Base
 class UserSession(Base):
     """ UserSession class
     """
+    __slots__ = ('user_id', 'session_id')
+    indexed_attributes = {'session_id': True, 'user_id': False}
+    ordered_by_creation = True
 
     def __init__(self, *args: list, **kwargs: dict):
         """ Initializing the instances
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+""" Concurrency stress test of the model store: RWLock exclusion, then
+threads saving, removing, reading and dumping Users at the same time,
+followed by a consistency check of the indexes and of the file
+written (any STORAGE_ENGINE)
+
+./stress_test.py [seconds] [writers] [readers]
+"""
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+os.chdir(tempfile.mkdtemp())
+
+from models.base import DATA, INDEXES, INDEXED_VALUES, ORDERED_IDS  # noqa
+from models.rwlock import RWLock  # noqa: E402
+from models.user import User  # noqa: E402
+
+
+def run_threads(targets: list, seconds: float) -> list:
+    """ Run each target(deadline) in its own thread until the deadline
+    Return the exceptions raised
+    """
+    errors = []
+    deadline = time.monotonic() + seconds
+
+    def run(target):
+        try:
+            target(deadline)
+        except Exception as error:
+            errors.append(error)
+
+    threads = [threading.Thread(target=run, args=(target,))
+               for target in targets]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return errors
+
+
+def stress_rwlock(seconds: float, writers: int, readers: int) -> list:
+    """ Check that a writer never holds an RWLock with anybody else
+    """
+    lock = RWLock()
+    state = {"readers": 0, "writers": 0}
+    state_lock = threading.Lock()
+    errors = []
+
+    def reader(deadline):
+        while time.monotonic() < deadline:
+            with lock.read():
+                with state_lock:
+                    state["readers"] += 1
+                    if state["writers"]:
+                        errors.append("reader inside a writer")
+                time.sleep(0)
+                with state_lock:
+                    state["readers"] -= 1
+
+    def writer(deadline):
+        while time.monotonic() < deadline:
+            with lock.write():
+                with state_lock:
+                    state["writers"] += 1
+                    if state["writers"] > 1 or state["readers"]:
+                        errors.append("writer not alone")
+                time.sleep(0)
+                with state_lock:
+                    state["writers"] -= 1
+
+    errors += run_threads([writer] * writers + [reader] * readers, seconds)
+    return errors
+
+
+def stress_models(seconds: float, writers: int, readers: int) -> list:
+    """ Mutate, read and dump Users concurrently, then check the store
+    """
+    alive = [set() for _ in range(writers)]
+    reads = [0]
+    errors = []
+
+    def writer(n):
+        def target(deadline):
+            i = 0
+            while time.monotonic() < deadline:
+                if alive[n] and random.random() < 0.3:
+                    user = User.get(random.choice(list(alive[n])))
+                    user.remove()
+                    alive[n].discard(user.id)
+                elif alive[n] and random.random() < 0.3:
+                    user = User.get(random.choice(list(alive[n])))
+                    user.first_name = "updated"
+                    user.save()
+                else:
+                    user = User(email="w{}-{}@stress.test".format(n, i))
+                    user.save()
+                    alive[n].add(user.id)
+                i += 1
+        return target
+
+    def reader(deadline):
+        while time.monotonic() < deadline:
+            users = User.page(limit=50)
+            for user in users:
+                if User.search({"email": user.email}) == []:
+                    # removed meanwhile: it must be gone from the store
+                    if User.get(user.id) is not None:
+                        errors.append("indexed user missing from search")
+            User.count()
+            len(User.all())
+            reads[0] += 1
+
+    def dumper(deadline):
+        while time.monotonic() < deadline:
+            User.save_to_file()
+            time.sleep(0.01)
+
+    errors += run_threads([writer(n) for n in range(writers)] +
+                          [reader] * readers + [dumper], seconds)
+
+    expected = set().union(*alive)
+    if set(DATA["User"]) != expected:
+        errors.append("DATA does not hold the users saved")
+    if ORDERED_IDS["User"] != sorted(expected):
+        errors.append("ORDERED_IDS out of sync")
+    if set(INDEXED_VALUES["User"]) != expected:
+        errors.append("INDEXED_VALUES out of sync")
+    for email, obj_ids in INDEXES["User"]["email"].items():
+        for obj_id in obj_ids:
+            if User.get(obj_id).email != email:
+                errors.append("email index out of sync")
+    User.save_to_file()
+    User.load_from_file()
+    if set(DATA["User"]) != expected:
+        errors.append("file does not hold the users saved")
+    print("{} users kept, {} read rounds".format(len(expected), reads[0]))
+    return errors
+
+
+if __name__ == "__main__":
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 5
+    writers = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    readers = int(sys.argv[3]) if len(sys.argv) > 3 else 8
+    errors = stress_rwlock(seconds / 2, writers, readers)
+    errors += stress_models(seconds, writers, readers)
+    for error in errors[:10]:
+        print("FAIL:", error)
+    print("OK" if not errors else "{} errors".format(len(errors)))
+    sys.exit(1 if errors else 0)
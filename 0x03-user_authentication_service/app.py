@@ -4,13 +4,35 @@
 from flask import Flask, jsonify, request
 from flask import abort, make_response, redirect, url_for
 from auth import Auth
+from bulk import BULK_MAX_BYTES, BULK_MAX_ROWS
+from bulk import bulk_authorized, bulk_enabled, read_records
+from hashing import HashingBusy
+import signal
+import sys
 
 
 app = Flask(__name__)
+app.config['MAX_CONTENT_LENGTH'] = BULK_MAX_BYTES
 
 AUTH = Auth()
 
 
+@app.teardown_appcontext
+def release_db_session(exception=None) -> None:
+    """ Release the database session of the request thread
+    """
+    AUTH.release_db_session()
+
+
+@app.errorhandler(HashingBusy)
+def hashing_busy(error) -> str:
+    """ Password hashing pool saturated handler
+    """
+    response = jsonify({"message": "server busy, retry later"})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
+
 @app.route('/', methods=['GET'], strict_slashes=False)
 def home() -> str:
     """ GET /
@@ -36,10 +58,42 @@ def users() -> str:
         user = AUTH.register_user(email, password)
         return jsonify({"email": user.email, "message": "user created"}), 200
 
+    except HashingBusy:
+        raise
     except Exception:
         return ({"message": "email already registered"}), 400
 
 
+@app.route('/users/bulk', methods=['POST'], strict_slashes=False)
+def users_bulk() -> str:
+    """ POST /users/bulk
+    Body: NDJSON ({"email", "password"} per line) or CSV (text/csv)
+    Return:
+        Json Payload with a result per submitted user
+    """
+    if not bulk_enabled():
+        abort(404)
+
+    if not bulk_authorized(request.headers.get("Authorization")):
+        abort(401)
+
+    body = request.get_data()
+    if request.content_length is None and len(body) >= BULK_MAX_BYTES:
+        # Chunked bodies are cut at MAX_CONTENT_LENGTH, not refused
+        abort(413)
+
+    records = read_records(body.decode('utf-8', 'replace'),
+                           request.mimetype)
+    if len(records) > BULK_MAX_ROWS:
+        abort(413)
+
+    results = AUTH.register_users(records)
+    created = sum(1 for result in results if "error" not in result)
+    return jsonify({"created": created,
+                    "failed": len(results) - created,
+                    "results": results}), 200
+
+
 @app.route('/sessions', methods=['POST'], strict_slashes=False)
 def login() -> str:
     """ POST /sessions
@@ -139,4 +193,7 @@ def update_password():
 
 
 if __name__ == "__main__":
+    # Exit on SIGTERM through the atexit handlers, which stop the
+    # hashing workers
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
     app.run(host="0.0.0.0", port="5000")
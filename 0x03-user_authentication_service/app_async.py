@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+""" Module that defines an asyncio (ASGI) variant of the flask app
+
+The routes and the Auth business logic are the same as app.py, but
+slow or idle clients only cost a coroutine: database calls run in a
+pool of ASYNC_WORKERS threads and bcrypt in the hashing processes.
+
+Run it with any ASGI server, e.g.:
+uvicorn app_async:app --host 0.0.0.0 --port 5000
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from http.cookies import SimpleCookie
+import json
+import os
+from urllib.parse import parse_qs
+from auth import Auth
+from bulk import BULK_MAX_BYTES, BULK_MAX_ROWS
+from bulk import bulk_authorized, bulk_enabled, read_records
+from config import getenv_int
+from hashing import HashingBusy
+
+
+AUTH = Auth()
+
+EXECUTOR = ThreadPoolExecutor(
+        getenv_int('ASYNC_WORKERS', min(32, (os.cpu_count() or 1) + 4)),
+        thread_name_prefix='auth')
+
+
+class Request:
+    """ The parts of an HTTP request the routes read
+    """
+
+    def __init__(self, scope: dict, body: bytes):
+        """ Initialize a request from its ASGI scope and body
+        """
+        self.headers = {name.decode('latin-1'): value.decode('latin-1')
+                        for name, value in scope['headers']}
+        self.body = body
+        self.form = {key: values[0] for key, values in
+                     parse_qs(body.decode('utf-8', 'replace')).items()}
+        cookies = SimpleCookie(self.headers.get('cookie', ''))
+        self.cookies = {key: morsel.value for key, morsel in cookies.items()}
+
+    @property
+    def mimetype(self) -> str:
+        """ Content type without its parameters
+        """
+        return self.headers.get('content-type', '').split(';')[0].strip()
+
+
+class Response:
+    """ Status, headers and JSON body sent back to the client
+    """
+
+    def __init__(self, payload=None, status: int = 200, headers=None):
+        """ Initialize a response
+        """
+        self.status = status
+        self.headers = dict(headers or {})
+        self.body = b''
+        if payload is not None:
+            self.body = json.dumps(payload).encode('utf-8')
+            self.headers['content-type'] = 'application/json'
+
+
+def abort(status: int) -> Response:
+    """ Error response for an HTTP status
+    """
+    return Response({"error": HTTPStatus(status).phrase}, status)
+
+
+async def call(function, *args):
+    """ Run a blocking Auth method in the worker threads, releasing
+    the database session of the thread afterwards
+    """
+    def run():
+        try:
+            return function(*args)
+        finally:
+            AUTH.release_db_session()
+    return await asyncio.get_running_loop().run_in_executor(EXECUTOR, run)
+
+
+async def home(request: Request) -> Response:
+    """ GET /
+    Return:
+        Json payload
+    """
+    return Response({"message": "Bienvenue"})
+
+
+async def users(request: Request) -> Response:
+    """ POST /users/
+    Return:
+        Json Payload
+    """
+    email = request.form.get("email")
+    password = request.form.get("password")
+
+    if not email or not password:
+        return Response({"message": "email and password required"}, 400)
+
+    try:
+        user = await call(AUTH.register_user, email, password)
+        return Response({"email": user.email, "message": "user created"})
+
+    except HashingBusy:
+        raise
+    except Exception:
+        return Response({"message": "email already registered"}, 400)
+
+
+async def users_bulk(request: Request) -> Response:
+    """ POST /users/bulk
+    Body: NDJSON ({"email", "password"} per line) or CSV (text/csv)
+    Return:
+        Json Payload with a result per submitted user
+    """
+    if not bulk_enabled():
+        return abort(404)
+
+    if not bulk_authorized(request.headers.get("authorization")):
+        return abort(401)
+
+    records = read_records(request.body.decode('utf-8', 'replace'),
+                           request.mimetype)
+    if len(records) > BULK_MAX_ROWS:
+        return abort(413)
+
+    results = await call(AUTH.register_users, records)
+    created = sum(1 for result in results if "error" not in result)
+    return Response({"created": created,
+                     "failed": len(results) - created,
+                     "results": results})
+
+
+async def login(request: Request) -> Response:
+    """ POST /sessions
+    Return:
+        Json Payload
+    """
+    email = request.form.get("email")
+    password = request.form.get("password")
+
+    if not email or not password:
+        return abort(401)
+
+    if not await call(AUTH.valid_login, email, password):
+        return abort(401)
+
+    session_id = await call(AUTH.create_session, email)
+
+    return Response({"email": email, "message": "logged in"}, headers={
+        'set-cookie': f"session_id={session_id}; Path=/"})
+
+
+async def logout(request: Request) -> Response:
+    """ DELETE /sessions
+    """
+    session_id = request.cookies.get("session_id")
+
+    if not session_id:
+        return abort(403)
+
+    user = await call(AUTH.get_user_from_session_id, session_id)
+
+    if not user:
+        return abort(403)
+
+    await call(AUTH.destroy_session, user.id)
+    return Response(status=302, headers={'location': '/'})
+
+
+async def profile(request: Request) -> Response:
+    """ GET /profile
+    """
+    session_id = request.cookies.get("session_id")
+
+    if not session_id:
+        return abort(403)
+
+    user = await call(AUTH.get_user_from_session_id, session_id)
+
+    if not user:
+        return abort(403)
+
+    return Response({"email": user.email})
+
+
+async def get_reset_password_token(request: Request) -> Response:
+    """ POST /reset_password
+    """
+    email = request.form.get("email")
+
+    if not email:
+        return abort(400)
+
+    try:
+        reset_token = await call(AUTH.get_reset_password_token, email)
+        return Response({"email": email, "reset_token": reset_token})
+
+    except ValueError:
+        return abort(403)
+
+
+async def update_password(request: Request) -> Response:
+    """ PUT /reset_password
+    Return:
+        Json Payload indicating password updated
+    """
+    email = request.form.get("email")
+    reset_token = request.form.get("reset_token")
+    new_password = request.form.get("new_password")
+
+    if not email or not reset_token or not new_password:
+        return abort(403)
+
+    try:
+        await call(AUTH.update_password, reset_token, new_password)
+        return Response({"email": email, "message": "Password updated"})
+
+    except ValueError:
+        return abort(403)
+
+
+ROUTES = {
+    '/': {'GET': home},
+    '/users': {'POST': users},
+    '/users/bulk': {'POST': users_bulk},
+    '/sessions': {'POST': login, 'DELETE': logout},
+    '/profile': {'GET': profile},
+    '/reset_password': {'POST': get_reset_password_token,
+                        'PUT': update_password},
+}
+
+
+async def read_body(receive, limit: int) -> bytes:
+    """ Read the whole body of an HTTP request, None if it is longer
+    than limit bytes
+    """
+    chunks = []
+    size = 0
+    while True:
+        message = await receive()
+        chunk = message.get('body', b'')
+        size += len(chunk)
+        if size > limit:
+            return None
+        chunks.append(chunk)
+        if not message.get('more_body'):
+            return b''.join(chunks)
+
+
+async def lifespan(receive, send) -> None:
+    """ Answer the ASGI server start up and shut down events
+    """
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            EXECUTOR.shutdown(wait=False)
+            # uvicorn re-raises the stop signal afterwards, atexit
+            # handlers would not get to stop the hashing workers
+            AUTH.close()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send) -> None:
+    """ ASGI application
+    """
+    if scope['type'] == 'lifespan':
+        return await lifespan(receive, send)
+    if scope['type'] != 'http':
+        return
+
+    methods = ROUTES.get(scope['path'].rstrip('/') or '/')
+    if methods is None:
+        response = abort(404)
+    elif scope['method'] not in methods:
+        response = abort(405)
+        response.headers['allow'] = ', '.join(methods)
+    else:
+        body = await read_body(receive, BULK_MAX_BYTES)
+        if body is None:
+            response = abort(413)
+        else:
+            try:
+                response = await methods[scope['method']](
+                        Request(scope, body))
+            except HashingBusy:
+                response = Response(
+                        {"message": "server busy, retry later"},
+                        503, {'retry-after': '1'})
+
+    response.headers['content-length'] = str(len(response.body))
+    await send({'type': 'http.response.start',
+                'status': response.status,
+                'headers': [(name.encode('latin-1'), value.encode('latin-1'))
+                            for name, value in response.headers.items()]})
+    await send({'type': 'http.response.body', 'body': response.body})
@@ -3,19 +3,31 @@
 """
 import bcrypt
 import secrets
+from cache import SessionCache
+from config import getenv_int
 from db import DB, User
+from hashing import BCRYPT_ROUNDS, HashingBusy, HashingService, hash_rounds
 from sqlalchemy.orm.exc import NoResultFound
+from typing import Iterable, List
 import uuid
 
 
 def _hash_password(password: str) -> bytes:
     """ Method to return the hashed password
     """
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(BCRYPT_ROUNDS)
     hashed_password = bcrypt.hashpw(password.encode('utf-8'), salt)
     return hashed_password
 
 
+def _user_columns(user: User) -> dict:
+    """ Method that returns the columns of a User kept in the session
+    cache (never the password hash or reset token)
+    """
+    return {"id": user.id, "email": user.email,
+            "session_id": user.session_id}
+
+
 def _generate_uuid() -> str:
     """ Method that returns a string representation of new UUID
     """
@@ -28,6 +40,24 @@ class Auth:
 
     def __init__(self):
         self._db = DB()
+        self._hasher = HashingService()
+        # Users of session IDs: SESSION_CACHE_SIZE entries (0 disables)
+        # kept SESSION_CACHE_TTL seconds
+        self.session_cache = SessionCache(
+                getenv_int("SESSION_CACHE_SIZE", 1024),
+                getenv_int("SESSION_CACHE_TTL", 60))
+
+    def release_db_session(self) -> None:
+        """ Method that releases the database session of the current
+        thread, at the end of a request
+        """
+        self._db.remove_session()
+
+    def close(self) -> None:
+        """ Method that stops the password hashing workers, when the
+        server shuts down
+        """
+        self._hasher.close()
 
     def register_user(self, email: str, password: str) -> User:
         """ Method that takes in str args and return User object
@@ -41,8 +71,8 @@ class Auth:
         except NoResultFound:
             pass
 
-        # Hash the password
-        hashed_password = _hash_password(password)
+        # Hash the password in the hashing pool
+        hashed_password = self._hasher.hash(password)
 
         # Add the new User object to database
         new_user = self._db.add_user(
@@ -50,32 +80,91 @@ class Auth:
 
         return new_user
 
+    def register_users(self, records: Iterable[dict]) -> List[dict]:
+        """ Register many users at once: duplicates are found with one
+        set-based query, passwords are hashed in parallel in the
+        hashing pool and rows are inserted in batched transactions
+        Return:
+            One result per record, with a message or an error
+        """
+        results = []
+        pending = {}
+        for record in records:
+            email = record.get("email")
+            password = record.get("password")
+            result = {"email": email}
+            results.append(result)
+            if not email or not password:
+                result["error"] = "email and password required"
+            elif not isinstance(email, str) or \
+                    not isinstance(password, str):
+                result["error"] = "email and password must be strings"
+            elif email in pending:
+                result["error"] = "duplicate email in request"
+            else:
+                pending[email] = (result, password)
+
+        for email in self._db.find_existing_emails(pending):
+            result, _ = pending.pop(email)
+            result["error"] = "email already registered"
+
+        emails = list(pending)
+        hashed_passwords = self._hasher.hash_many(
+                [pending[email][1] for email in emails])
+        errors = self._db.add_users([
+            (email, hashed_password.decode('utf-8'))
+            for email, hashed_password in zip(emails, hashed_passwords)])
+        for email, error in zip(emails, errors):
+            result = pending[email][0]
+            if error:
+                result["error"] = error
+            else:
+                result["message"] = "user created"
+        return results
+
     def valid_login(self, email: str, password: str) -> bool:
         """ Method that locates if the email is valid and decode
+        A password hashed with another work factor than BCRYPT_ROUNDS
+        is rehashed once it matched
         Return:
             True if it matches or False
         """
         try:
             user = self._db.find_user_by(email=email)
-            return bcrypt.checkpw(password.encode(
-                'utf-8'), user.hashed_password.encode('utf-8'))
+            if not self._hasher.check(password, user.hashed_password):
+                return False
+        except HashingBusy:
+            raise
         except Exception:
             return False
 
+        if hash_rounds(user.hashed_password) != BCRYPT_ROUNDS:
+            try:
+                hashed_password = self._hasher.hash(password)
+                # Unless the password changed meanwhile
+                self._db.update_user_where(
+                        {"id": user.id,
+                         "hashed_password": user.hashed_password},
+                        hashed_password=hashed_password.decode('utf-8'))
+            except HashingBusy:
+                pass
+        return True
+
     def create_session(self, email: str) -> str:
-        """ Method that finds user to the email, generate a new UUID and store
-        it in the database as the user's session_id
+        """ Method that generates a new UUID and stores it as the
+        session_id of the user with this email, in a single UPDATE
+        where the database supports UPDATE ... RETURNING
         """
-        try:
-            new_user = self._db.find_user_by(email=email)
-        except NoResultFound:
-            return None
-
         # Generate a new UUID for the session ID
         session_id = _generate_uuid()
 
         # Update the user's session_id in the database
-        self._db.update_user(new_user.id, session_id=session_id)
+        user = self._db.update_one_user({"email": email},
+                                        session_id=session_id)
+        if user is None:
+            return None
+        # Replaces the previous cached session of the user
+        self.session_cache.set(session_id, _user_columns(user))
 
         # Return the session ID
         return session_id
@@ -86,40 +175,47 @@ class Auth:
         if session_id is None:
             return None
 
+        columns = self.session_cache.get(session_id)
+        if columns is not None:
+            return User(**columns)
+
         try:
             new_user = self._db.find_user_by(session_id=session_id)
-            return new_user
         except NoResultFound:
             return None
+        self.session_cache.set(session_id, _user_columns(new_user))
+        return new_user
 
     def destroy_session(self, user_id: int) -> None:
         """ Method that destroys a session
         """
-        try:
-            self._db.update_user(user_id, session_id=None)
-        except NoResultFound:
-            return None
+        self._db.update_user_where({"id": user_id}, session_id=None)
+        # Only once committed: a concurrent lookup could otherwise cache
+        # the row again while it still holds the session
+        self.session_cache.evict_user(user_id)
 
     def get_reset_password_token(self, email: str) -> str:
         """ Method that resets the user's token
         """
-        try:
-            user = self._db.find_user_by(email=email)
-        except NoResultFound:
-            raise ValueError(f"User {email} does not exist")
-
         reset_token = _generate_uuid()
-        self._db.update_user(user.id, reset_token=reset_token)
+        if not self._db.update_user_where({"email": email},
+                                          reset_token=reset_token):
+            raise ValueError(f"User {email} does not exist")
         return reset_token
 
     def update_password(self, reset_token: str, password: str) -> None:
-        """ Method that updates the password
+        """ Method that updates the password, consuming the reset token
+        only if it is still the user's current one
         """
+        # Reject unknown tokens before spending a bcrypt hash on them
         try:
-            user = self._db.find_user_by(reset_token=reset_token)
-            hashed_password = _hash_password(password)
-            self._db.update_user(
-                    user.id, hashed_password=hashed_password.decode(
-                        'utf-8'), reset_token=None)
+            self._db.find_user_by(reset_token=reset_token)
         except NoResultFound:
             raise ValueError("Invalid reset token")
+
+        hashed_password = self._hasher.hash(password)
+        if not self._db.update_user_where(
+                {"reset_token": reset_token},
+                hashed_password=hashed_password.decode('utf-8'),
+                reset_token=None):
+            raise ValueError("Invalid reset token")
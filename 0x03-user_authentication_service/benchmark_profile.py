@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+""" Benchmark of GET /profile latency as the users table grows, with
+the lookup indexes of user.py and, with --no-index, without them
+(session cache off, in a fresh SQLite database)
+
+./benchmark_profile.py [--no-index] [sizes...]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+
+os.environ["DB_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(),
+                                                   "profile.db")
+os.environ["DB_RESET"] = "1"
+os.environ["SESSION_CACHE_SIZE"] = "0"
+
+from app import app, AUTH  # noqa: E402
+from user import User  # noqa: E402
+
+SAMPLES = 200
+
+
+def grow(engine, count: int, size: int) -> list:
+    """ Insert users up to size rows, each logged in
+    Return the session IDs inserted
+    """
+    session_ids = []
+    with engine.begin() as conn:
+        while count < size:
+            rows = [{"email": "user{}@bench.test".format(i),
+                     "hashed_password": "x",
+                     "session_id": str(uuid.uuid4())}
+                    for i in range(count, min(size, count + 10000))]
+            conn.execute(User.__table__.insert(), rows)
+            session_ids.extend(row["session_id"] for row in rows)
+            count += len(rows)
+    return session_ids
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    no_index = "--no-index" in args
+    sizes = [int(arg) for arg in args if arg != "--no-index"] or \
+        [1000, 10000, 100000, 1000000]
+    engine = AUTH._db._engine
+    if no_index:
+        with engine.begin() as conn:
+            for index in User.__table__.indexes:
+                index.drop(conn)
+
+    client = app.test_client(use_cookies=False)
+    session_ids = []
+    print("indexes: {}".format("none" if no_index else "declared"))
+    print("     users   p50 (ms)   p99 (ms)")
+    for size in sizes:
+        session_ids += grow(engine, len(session_ids), size)
+        latencies = []
+        for session_id in random.sample(session_ids,
+                                        min(SAMPLES, len(session_ids))):
+            start = time.perf_counter()
+            response = client.get("/profile", headers={
+                "Cookie": "session_id=" + session_id})
+            latencies.append((time.perf_counter() - start) * 1000)
+            assert response.status_code == 200
+        latencies.sort()
+        print("{:>10} {:>10.3f} {:>10.3f}".format(
+            size, latencies[len(latencies) // 2],
+            latencies[int(len(latencies) * 0.99)]))
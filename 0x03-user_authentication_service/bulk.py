@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+""" Module that reads bulk user registrations, as NDJSON (one
+{"email": ..., "password": ...} object per line) or as CSV with an
+email,password header
+
+POST /users/bulk is only served when BULK_ADMIN_TOKEN is set, to
+requests with an "Authorization: Bearer <token>" header, and takes at
+most BULK_MAX_ROWS rows and BULK_MAX_BYTES bytes. Larger imports go
+from a file straight into the database:
+./bulk.py users.csv|users.ndjson|- [csv|ndjson]
+"""
+import csv
+import hmac
+import io
+import json
+import os
+import sys
+from typing import Iterable, List
+
+from config import getenv_int
+
+
+BULK_MAX_ROWS = getenv_int('BULK_MAX_ROWS', 1000)
+
+BULK_MAX_BYTES = getenv_int('BULK_MAX_BYTES', 1024 * 1024)
+
+
+def bulk_enabled() -> bool:
+    """ True if an admin token is configured for POST /users/bulk
+    """
+    return bool(os.getenv('BULK_ADMIN_TOKEN'))
+
+
+def bulk_authorized(authorization: str) -> bool:
+    """ True if an Authorization header carries the admin token
+    """
+    token = os.getenv('BULK_ADMIN_TOKEN')
+    if not token or not authorization:
+        return False
+    scheme, _, credentials = authorization.partition(' ')
+    return scheme.lower() == 'bearer' and hmac.compare_digest(
+            credentials.strip().encode('utf-8'), token.encode('utf-8'))
+
+
+def read_ndjson(lines: Iterable[str]) -> List[dict]:
+    """ Records of an NDJSON document, blank lines are skipped
+    A malformed line becomes a record without email or password
+    """
+    records = []
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = None
+        records.append(record if isinstance(record, dict) else {})
+    return records
+
+
+def read_csv(lines: Iterable[str]) -> List[dict]:
+    """ Records of a CSV document with an email,password header
+    """
+    return [{"email": row.get("email"), "password": row.get("password")}
+            for row in csv.DictReader(lines)]
+
+
+def read_records(text: str, content_type: str = None) -> List[dict]:
+    """ Records of a bulk registration body, CSV when the content type
+    (or the first line) says so, NDJSON otherwise
+    """
+    lines = io.StringIO(text)
+    if content_type:
+        is_csv = 'csv' in content_type
+    else:
+        is_csv = not text.lstrip().startswith('{')
+    return read_csv(lines) if is_csv else read_ndjson(lines)
+
+
+if __name__ == "__main__":
+    from auth import Auth
+
+    path = sys.argv[1] if len(sys.argv) > 1 else '-'
+    content_type = sys.argv[2] if len(sys.argv) > 2 else None
+    if content_type is None and path.endswith('.csv'):
+        content_type = 'csv'
+    elif content_type is None and path.endswith(('.ndjson', '.jsonl')):
+        content_type = 'ndjson'
+    if path == '-':
+        text = sys.stdin.read()
+    else:
+        with open(path, encoding='utf-8', newline='') as f:
+            text = f.read()
+    for result in Auth().register_users(read_records(text, content_type)):
+        print(json.dumps(result))
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+""" Module that caches the users of session IDs
+"""
+from collections import OrderedDict
+import threading
+import time
+
+
+class SessionCache:
+    """ LRU cache of session ID -> user columns, each entry kept for
+    ttl seconds, with hit and miss counters
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60):
+        """ Initialize an empty cache
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._session_by_user = {}
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str) -> dict:
+        """ Return the cached user columns of a session ID, or None
+        """
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is not None and entry[0] < time.monotonic():
+                self._discard(session_id)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(session_id)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, session_id: str, user: dict) -> None:
+        """ Cache the user columns (with at least 'id') of a session ID
+        """
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._discard_user(user['id'])
+            self._discard(session_id)
+            self._entries[session_id] = (time.monotonic() + self.ttl, user)
+            self._session_by_user[user['id']] = session_id
+            while len(self._entries) > self.maxsize:
+                self._discard(next(iter(self._entries)))
+
+    def evict_user(self, user_id: int) -> None:
+        """ Forget the cached session of a user
+        """
+        with self._lock:
+            self._discard_user(user_id)
+
+    def stats(self) -> dict:
+        """ Hit and miss counters and number of cached sessions
+        """
+        return {"hits": self.hits, "misses": self.misses,
+                "size": len(self._entries)}
+
+    def _discard(self, session_id: str) -> None:
+        """ Remove a session ID (lock must be held)
+        """
+        entry = self._entries.pop(session_id, None)
+        if entry is not None and \
+                self._session_by_user.get(entry[1]['id']) == session_id:
+            del self._session_by_user[entry[1]['id']]
+
+    def _discard_user(self, user_id: int) -> None:
+        """ Remove the session ID of a user (lock must be held)
+        """
+        session_id = self._session_by_user.get(user_id)
+        if session_id is not None:
+            self._discard(session_id)
@@ -0,0 +1,14 @@
+#!/usr/bin/env python3
+""" Module that reads the service settings from the environment
+"""
+import os
+
+
+def getenv_int(name: str, default: int) -> int:
+    """ Integer value of an environment variable, default when unset
+    or not an integer
+    """
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        return default
@@ -1,41 +1,95 @@
 #!/usr/bin/env python3
 """DB module
 """
-from sqlalchemy import create_engine
+from sqlalchemy import and_, create_engine, event, update
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import scoped_session, sessionmaker
 from sqlalchemy.orm.session import Session
+from sqlalchemy.pool import QueuePool
 from sqlalchemy.orm.exc import NoResultFound
-from sqlalchemy.exc import InvalidRequestError
+from sqlalchemy.exc import IntegrityError, InvalidRequestError
 import logging
+import os
+from typing import Iterable, List, Set, Tuple
 
+from config import getenv_int
+from migrations import migrate
 from user import Base, User
 
 
+# Columns that update_user and update_user_where accept
+ALLOWED_ATTRIBUTES = frozenset(User.__table__.columns.keys())
+
+
+def _check_update(criteria: dict, values: dict) -> None:
+    """ Raise a ValueError unless an update of users has criteria and
+    only names their columns
+    """
+    if not criteria:
+        raise ValueError("A user update needs at least one criterion")
+    for key in list(criteria) + list(values):
+        if key not in ALLOWED_ATTRIBUTES:
+            raise ValueError(f"Invalid attribute '{key}' for user update")
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    """ Let SQLite readers run alongside the writer (WAL) and wait for
+    locks instead of failing right away
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA busy_timeout=5000")
+    cursor.close()
+
+
 class DB:
     """DB class
     """
 
     def __init__(self) -> None:
-        """Initialize a new DB instance
+        """Initialize a new DB instance on DB_URL (default sqlite:///a.db)
+        Existing data is kept: only missing tables are created and
+        pending migrations applied, unless DB_RESET=1 drops everything
+        The connection pool is sized by DB_POOL_SIZE and DB_MAX_OVERFLOW
         """
         # Set logging level to WARNING to suppress info logs
         logging.basicConfig(level=logging.WARNING)
         logging.getLogger('sqlalchemy.engine').setLevel(logging.WARNING)
 
-        self._engine = create_engine("sqlite:///a.db", echo=False)
-        Base.metadata.drop_all(self._engine)
+        url = os.getenv("DB_URL", "sqlite:///a.db")
+        engine_args = {"echo": False, "pool_pre_ping": True}
+        if url.startswith("sqlite"):
+            # Connections are shared by request threads through the pool
+            engine_args["connect_args"] = {"check_same_thread": False}
+        if os.getenv("DB_POOL_SIZE") is not None:
+            engine_args["poolclass"] = QueuePool
+            engine_args["pool_size"] = getenv_int("DB_POOL_SIZE", 5)
+            engine_args["max_overflow"] = getenv_int("DB_MAX_OVERFLOW", 10)
+        self._engine = create_engine(url, **engine_args)
+        if url.startswith("sqlite"):
+            event.listen(self._engine, "connect", _set_sqlite_pragmas)
+
+        # Popped so that processes started from this one (e.g. the
+        # hashing workers re-importing app.py) do not reset it again
+        if os.environ.pop("DB_RESET", None) == "1":
+            Base.metadata.drop_all(self._engine)
         Base.metadata.create_all(self._engine)
-        self.__session = None
+        migrate(self._engine)
+        self.__session = scoped_session(
+                sessionmaker(bind=self._engine, expire_on_commit=False))
 
     @property
     def _session(self) -> Session:
-        """Memoized session object
+        """Session object of the current thread
+        """
+        return self.__session()
+
+    def remove_session(self) -> None:
+        """ Close the session of the current thread, returning its
+        connection to the pool
         """
-        if self.__session is None:
-            DBSession = sessionmaker(bind=self._engine)
-            self.__session = DBSession()
-        return self.__session
+        self.__session.remove()
 
     def add_user(self, email: str, hashed_password: str) -> User:
         """ Method that save the user to the database
@@ -48,9 +102,54 @@ class DB:
         """
         new_user = User(email=email, hashed_password=hashed_password)
         self._session.add(new_user)
-        self._session.commit()
+        try:
+            self._session.commit()
+        except IntegrityError:
+            # The email is already registered (unique index)
+            self._session.rollback()
+            raise
         return new_user
 
+    def add_users(self, users: List[Tuple[str, str]],
+                  batch_size: int = 500) -> List[str]:
+        """ Insert (email, hashed_password) pairs, one transaction per
+        batch_size rows. A batch hitting the unique email index is
+        retried row by row so only the offending rows fail
+        Return:
+            An error message per pair, None for each inserted user
+        """
+        errors = []
+        for start in range(0, len(users), batch_size):
+            batch = users[start:start + batch_size]
+            try:
+                self._session.bulk_insert_mappings(User, [
+                    {"email": email, "hashed_password": hashed_password}
+                    for email, hashed_password in batch])
+                self._session.commit()
+                errors.extend([None] * len(batch))
+            except IntegrityError:
+                self._session.rollback()
+                for email, hashed_password in batch:
+                    try:
+                        self.add_user(email, hashed_password)
+                        errors.append(None)
+                    except IntegrityError:
+                        errors.append("email already registered")
+        return errors
+
+    def find_existing_emails(self, emails: Iterable[str],
+                             batch_size: int = 500) -> Set[str]:
+        """ Return the subset of emails already registered, looked up
+        batch_size at a time with an IN query on the email index
+        """
+        emails = list(emails)
+        existing = set()
+        for start in range(0, len(emails), batch_size):
+            rows = self._session.query(User.email).filter(
+                    User.email.in_(emails[start:start + batch_size]))
+            existing.update(email for email, in rows)
+        return existing
+
     def find_user_by(self, **kwargs) -> User:
         """ Find a user by arbitrary Keyword arguments
         """
@@ -63,13 +162,58 @@ class DB:
 
     def update_user(self, user_id: int, **kwargs) -> None:
         """ Method that takes in a required user_id and arbitrary argument
+        and updates the row in place, without loading the user first
         Return:
             None
         """
-        user = self.find_user_by(id=user_id)
-        allowed_attr = set(User.__table__.columns.keys())
-        for key, value in kwargs.items():
-            if key not in allowed_attr:
-                raise ValueError(f"Invalid attribute '{key}' for user update")
-            setattr(user, key, value)
-        self._session.commit()
+        if not self.update_user_where({"id": user_id}, **kwargs):
+            raise NoResultFound(f"No user found for {{'id': {user_id}}}")
+
+    def update_user_where(self, criteria: dict, **kwargs) -> int:
+        """ Compare-and-set update: a single UPDATE of the columns in
+        kwargs on the rows whose columns equal criteria
+        Return:
+            The number of rows updated
+        """
+        _check_update(criteria, kwargs)
+        try:
+            rowcount = self._session.query(User).filter_by(
+                    **criteria).update(kwargs, synchronize_session='evaluate')
+            self._session.commit()
+        except IntegrityError:
+            self._session.rollback()
+            raise
+        return rowcount
+
+    def update_one_user(self, criteria: dict, **kwargs) -> User:
+        """ Update the user matching criteria, in one UPDATE ... RETURNING
+        round trip where the database supports it, otherwise a lookup
+        followed by a compare-and-set update
+        Return:
+            The user with its columns after the update, or None
+        """
+        _check_update(criteria, kwargs)
+        if not getattr(self._engine.dialect, "update_returning", False):
+            try:
+                user = self.find_user_by(**criteria)
+            except NoResultFound:
+                return None
+            if not self.update_user_where(dict(criteria, id=user.id),
+                                          **kwargs):
+                return None
+            return user
+
+        columns = list(User.__table__.columns)
+        statement = update(User).where(and_(*[
+            getattr(User, key) == value for key, value in criteria.items()
+        ])).values(**kwargs).returning(*columns).execution_options(
+            synchronize_session='evaluate')
+        try:
+            row = self._session.execute(statement).first()
+            self._session.commit()
+        except IntegrityError:
+            self._session.rollback()
+            raise
+        if row is None:
+            return None
+        return User(**dict(zip([column.key for column in columns], row)))
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+""" Module that runs bcrypt hashing in a pool of worker processes
+"""
+import atexit
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import List
+import bcrypt
+import multiprocessing
+import os
+import sys
+import threading
+import time
+
+from config import getenv_int
+
+
+class HashingBusy(Exception):
+    """ Raised when every hashing worker and queue slot is taken
+    """
+
+
+def _hashpw(password: bytes, rounds: int) -> bytes:
+    """ Hash a password with a new salt (runs in a worker)
+    """
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds))
+
+
+def _hashpw_many(passwords: List[bytes], rounds: int) -> List[bytes]:
+    """ Salted bcrypt hashes of a chunk of passwords (runs in a worker)
+    """
+    return [_hashpw(password, rounds) for password in passwords]
+
+
+def _checkpw(password: bytes, hashed_password: bytes) -> bool:
+    """ Check a password against its hash (runs in a worker)
+    """
+    return bcrypt.checkpw(password, hashed_password)
+
+
+# bcrypt work factor of new hashes, passwords hashed with another one
+# are rehashed on the next successful login
+BCRYPT_ROUNDS = getenv_int('BCRYPT_ROUNDS', 12)
+
+
+def hash_rounds(hashed_password: str) -> int:
+    """ Work factor of a bcrypt hash ($2b$<rounds>$...), None if unknown
+    """
+    try:
+        return int(hashed_password.split('$')[2])
+    except (IndexError, ValueError):
+        return None
+
+
+class HashingService:
+    """ bcrypt hashing offloaded to HASH_WORKERS processes (default: one
+    per CPU, 0 to hash in the calling thread), with at most
+    HASH_QUEUE_SIZE calls waiting for a worker
+    Batches are hashed HASH_BULK_CHUNK passwords per queue slot
+    Workers are spawned, not forked, so they do not inherit the server
+    sockets and signal handlers, and are stopped by close() or at exit
+    """
+
+    def __init__(self):
+        """ Initialize the service, the pool starts on first use
+        """
+        self.workers = getenv_int('HASH_WORKERS', os.cpu_count() or 1)
+        self.queue_size = getenv_int('HASH_QUEUE_SIZE',
+                                     4 * max(self.workers, 1))
+        self._slots = threading.BoundedSemaphore(
+                max(self.workers, 1) + self.queue_size)
+        self.bulk_chunk = max(1, getenv_int('HASH_BULK_CHUNK', 4))
+        self._executor = None
+        self._lock = threading.Lock()
+        self._batch = threading.Lock()
+        atexit.register(self.close)
+
+    def _pool(self) -> ProcessPoolExecutor:
+        """ Return the worker pool, started on first use
+        """
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                        self.workers,
+                        mp_context=multiprocessing.get_context('spawn'))
+        return self._executor
+
+    def close(self) -> None:
+        """ Stop the worker processes once their current calls are
+        done; the next call starts a new pool
+        """
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def _run(self, function, *args):
+        """ Run a function in the pool and wait for its result
+        Raise HashingBusy instead of queueing past the limit
+        """
+        if not self._slots.acquire(blocking=False):
+            raise HashingBusy("Too many password hashing requests")
+        try:
+            if self.workers <= 0:
+                return function(*args)
+            return self._pool().submit(function, *args).result()
+        finally:
+            self._slots.release()
+
+    def hash(self, password: str, rounds: int = None) -> bytes:
+        """ Return the salted bcrypt hash of a password, with
+        BCRYPT_ROUNDS unless another work factor is given
+        """
+        if rounds is None:
+            rounds = BCRYPT_ROUNDS
+        return self._run(_hashpw, password.encode('utf-8'), rounds)
+
+    def hash_many(self, passwords: List[str],
+                  rounds: int = None) -> List[bytes]:
+        """ Hash a batch of passwords in chunks of HASH_BULK_CHUNK, each
+        waiting for and holding a queue slot, with at most one chunk
+        per worker in flight: single hash() and check() calls queue
+        behind a chunk, not the whole batch, or get HashingBusy
+        One batch is hashed at a time, HashingBusy is raised for the
+        others so that batches never hold more than a slot per worker
+        """
+        if rounds is None:
+            rounds = BCRYPT_ROUNDS
+        encoded = [password.encode('utf-8') for password in passwords]
+        chunks = [encoded[i:i + self.bulk_chunk]
+                  for i in range(0, len(encoded), self.bulk_chunk)]
+        if not chunks:
+            return []
+        if not self._batch.acquire(blocking=False):
+            raise HashingBusy("Another batch of passwords is being hashed")
+        try:
+            return self._hash_chunks(chunks, rounds)
+        finally:
+            self._batch.release()
+
+    def _hash_chunks(self, chunks: List[List[bytes]],
+                     rounds: int) -> List[bytes]:
+        """ Hashes of the chunks of a batch, in order
+        """
+        hashed_passwords = []
+        if self.workers <= 0:
+            for chunk in chunks:
+                with self._slots:
+                    hashed_passwords.extend(_hashpw_many(chunk, rounds))
+            return hashed_passwords
+
+        in_flight = deque()
+        for chunk in chunks:
+            if len(in_flight) >= self.workers:
+                hashed_passwords.extend(in_flight.popleft().result())
+            self._slots.acquire()
+            try:
+                future = self._pool().submit(_hashpw_many, chunk, rounds)
+            except BaseException:
+                self._slots.release()
+                raise
+            future.add_done_callback(lambda _: self._slots.release())
+            in_flight.append(future)
+        while in_flight:
+            hashed_passwords.extend(in_flight.popleft().result())
+        return hashed_passwords
+
+    def check(self, password: str, hashed_password: str) -> bool:
+        """ True if password matches its bcrypt hash
+        """
+        return self._run(_checkpw, password.encode('utf-8'),
+                         hashed_password.encode('utf-8'))
+
+
+if __name__ == "__main__":
+    """
+    Report the login latency (bcrypt check) for each work factor:
+    ./hashing.py [min_rounds] [max_rounds] [iterations]
+    """
+    min_rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    max_rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 14
+    iterations = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+    print("rounds  hash (ms)  login check (ms)")
+    for rounds in range(min_rounds, max_rounds + 1):
+        start = time.perf_counter()
+        hashed_password = _hashpw(b"benchmark password", rounds)
+        hash_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        for _ in range(iterations):
+            _checkpw(b"benchmark password", hashed_password)
+        check_ms = (time.perf_counter() - start) * 1000 / iterations
+        print("{:>6}  {:>9.1f}  {:>16.1f}".format(rounds, hash_ms, check_ms))
@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+""" Module that load tests a running auth service (app.py or
+app_async.py) with a weighted mix of the main.py scenarios
+
+Every worker thread owns one pre-registered user and a keep-alive
+connection. Each concurrency stage reports throughput and the
+p50/p95/p99 latency of every route; the saturation point of a route
+is the stage where its throughput stops growing while p99 climbs:
+./load_test.py --ramp 1,2,4,8,16,32 --duration 10 --mix profile=10,login=1
+"""
+import argparse
+import bisect
+from collections import defaultdict
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+import requests
+from bulk import BULK_MAX_ROWS
+from main import BASE_URL, PASSWD
+
+
+SCENARIOS = ('register', 'login', 'profile', 'logout', 'reset')
+
+DEFAULT_MIX = "register=1,login=2,profile=10,logout=1,reset=1"
+
+# Upper bounds (ms) of the latency histogram buckets
+BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+
+class Stats:
+    """ Latencies and failures of each route, shared by the workers
+    """
+
+    def __init__(self):
+        """ Initialize empty statistics
+        """
+        self.latencies = defaultdict(list)
+        self.failures = defaultdict(int)
+        self.busy = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def record(self, route: str, latency: float, status: int,
+               expected: int) -> bool:
+        """ Record a response, True if it had the expected status
+        """
+        with self._lock:
+            self.latencies[route].append(latency * 1000)
+            if status == 503:
+                self.busy[route] += 1
+            elif status != expected:
+                self.failures[route] += 1
+        return status == expected
+
+    def report(self, elapsed: float) -> dict:
+        """ Throughput and latency percentiles of each route
+        """
+        with self._lock:
+            routes = {route: summarize(latencies, elapsed)
+                      for route, latencies in sorted(self.latencies.items())}
+            for route, summary in routes.items():
+                summary["failures"] = self.failures[route]
+                summary["busy"] = self.busy[route]
+        total = sum(summary["requests"] for summary in routes.values())
+        return {"elapsed": elapsed, "requests": total,
+                "throughput": total / elapsed if elapsed else 0.0,
+                "routes": routes}
+
+
+def percentile(ordered: list, fraction: float) -> float:
+    """ Nearest-rank percentile of a sorted list
+    """
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def summarize(latencies: list, elapsed: float) -> dict:
+    """ Throughput, percentiles and histogram of a route's latencies
+    """
+    ordered = sorted(latencies)
+    histogram = [0] * (len(BUCKETS) + 1)
+    for latency in ordered:
+        histogram[bisect.bisect_left(BUCKETS, latency)] += 1
+    return {"requests": len(ordered),
+            "throughput": len(ordered) / elapsed if elapsed else 0.0,
+            "p50": percentile(ordered, 0.50),
+            "p95": percentile(ordered, 0.95),
+            "p99": percentile(ordered, 0.99),
+            "max": ordered[-1] if ordered else 0.0,
+            "histogram": histogram}
+
+
+class Worker(threading.Thread):
+    """ Thread running random scenarios as its own user until the
+    deadline
+    """
+
+    def __init__(self, base_url: str, email: str, mix: dict,
+                 stats: Stats, deadline: float, timeout: float):
+        """ Initialize a worker
+        """
+        super().__init__(daemon=True)
+        self.base_url = base_url
+        self.email = email
+        self.scenarios = list(mix)
+        self.weights = list(mix.values())
+        self.stats = stats
+        self.deadline = deadline
+        self.timeout = timeout
+        self.http = requests.Session()
+        self.session_id = None
+
+    def call(self, route: str, method: str, path: str, expected: int,
+             **kwargs) -> requests.Response:
+        """ Send a timed request, None when it failed
+        """
+        start = time.perf_counter()
+        try:
+            response = self.http.request(
+                    method, self.base_url + path, timeout=self.timeout,
+                    allow_redirects=False, **kwargs)
+        except requests.RequestException:
+            self.stats.record(route, time.perf_counter() - start, 0,
+                              expected)
+            return None
+        ok = self.stats.record(route, time.perf_counter() - start,
+                               response.status_code, expected)
+        return response if ok else None
+
+    def register(self) -> None:
+        """ Register a new user
+        """
+        email = f"load-{uuid.uuid4().hex}@load.test"
+        self.call("POST /users", "POST", "/users", 200,
+                  data={"email": email, "password": PASSWD})
+
+    def login(self) -> None:
+        """ Log the worker's user in
+        """
+        response = self.call("POST /sessions", "POST", "/sessions", 200,
+                             data={"email": self.email, "password": PASSWD})
+        self.session_id = response.cookies.get("session_id") \
+            if response is not None else None
+        self.http.cookies.clear()
+
+    def profile(self) -> None:
+        """ Read the profile, logging in first if needed
+        """
+        if self.session_id is None:
+            self.login()
+        self.call("GET /profile", "GET", "/profile", 200,
+                  cookies={"session_id": self.session_id or ""})
+
+    def logout(self) -> None:
+        """ Log out, logging in first if needed
+        """
+        if self.session_id is None:
+            self.login()
+        self.call("DELETE /sessions", "DELETE", "/sessions", 302,
+                  cookies={"session_id": self.session_id or ""})
+        self.session_id = None
+
+    def reset(self) -> None:
+        """ Ask for a reset token and set the same password again
+        """
+        response = self.call("POST /reset_password", "POST",
+                             "/reset_password", 200,
+                             data={"email": self.email})
+        if response is None:
+            return
+        self.call("PUT /reset_password", "PUT", "/reset_password", 200,
+                  data={"email": self.email,
+                        "reset_token": response.json()["reset_token"],
+                        "new_password": PASSWD})
+
+    def run(self) -> None:
+        """ Run scenarios until the deadline
+        """
+        while time.monotonic() < self.deadline:
+            scenario = random.choices(self.scenarios, self.weights)[0]
+            getattr(self, scenario)()
+
+
+def parse_mix(mix: str) -> dict:
+    """ Scenario weights of a "name=weight,..." string
+    """
+    weights = {}
+    for item in mix.split(','):
+        name, _, weight = item.partition('=')
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise ValueError(f"Unknown scenario '{name}'")
+        weights[name] = float(weight or 1)
+    return weights
+
+
+def register_users(base_url: str, count: int,
+                   admin_token: str = None) -> list:
+    """ Register count users for the workers, BULK_MAX_ROWS per
+    /users/bulk request when given its admin token and the server has
+    it, one POST /users each otherwise
+    Raise a RuntimeError if any of them could not be registered
+    """
+    emails = [f"load-{uuid.uuid4().hex}@load.test" for _ in range(count)]
+    remaining = emails
+    while admin_token and remaining:
+        batch = remaining[:BULK_MAX_ROWS]
+        body = "\n".join(json.dumps({"email": email, "password": PASSWD})
+                         for email in batch)
+        response = requests.post(
+                base_url + "/users/bulk", data=body,
+                headers={"content-type": "application/x-ndjson",
+                         "authorization": "Bearer " + admin_token})
+        if response.status_code == 404:
+            break
+        if response.status_code != 200:
+            raise RuntimeError(f"POST /users/bulk answered "
+                               f"{response.status_code}: "
+                               f"{response.text[:200]}")
+        if response.json()["failed"]:
+            raise RuntimeError(f"POST /users/bulk failed to register "
+                               f"{response.json()['failed']} users")
+        remaining = remaining[len(batch):]
+    for email in remaining:
+        response = requests.post(base_url + "/users",
+                                 data={"email": email, "password": PASSWD})
+        if response.status_code != 200:
+            raise RuntimeError(f"POST /users answered "
+                               f"{response.status_code}: "
+                               f"{response.text[:200]}")
+    return emails
+
+
+def run_stage(base_url: str, emails: list, mix: dict, duration: float,
+              timeout: float) -> dict:
+    """ Run one worker per email for duration seconds
+    """
+    stats = Stats()
+    deadline = time.monotonic() + duration
+    workers = [Worker(base_url, email, mix, stats, deadline, timeout)
+               for email in emails]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return stats.report(time.perf_counter() - start)
+
+
+def print_report(concurrency: int, report: dict) -> None:
+    """ Print the report of a stage
+    """
+    print(f"\nconcurrency {concurrency}: {report['requests']} requests "
+          f"in {report['elapsed']:.1f}s, {report['throughput']:.1f} req/s")
+    print(f"{'route':<22}{'req/s':>8}{'p50':>9}{'p95':>9}{'p99':>9}"
+          f"{'max':>9}{'fail':>6}{'503':>6}")
+    for route, summary in report["routes"].items():
+        print(f"{route:<22}{summary['throughput']:>8.1f}"
+              f"{summary['p50']:>9.1f}{summary['p95']:>9.1f}"
+              f"{summary['p99']:>9.1f}{summary['max']:>9.1f}"
+              f"{summary['failures']:>6}{summary['busy']:>6}")
+    print("latency histogram (ms):")
+    bounds = [f"<={bound}" for bound in BUCKETS] + [f">{BUCKETS[-1]}"]
+    for route, summary in report["routes"].items():
+        counts = ", ".join(f"{bound}: {count}" for bound, count
+                           in zip(bounds, summary["histogram"]) if count)
+        print(f"  {route:<22}{counts}")
+
+
+if __name__ == "__main__":
+    """
+    Run the load test stages and print (or dump as JSON) their reports
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default=BASE_URL)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--ramp", help="comma separated concurrencies, "
+                        "one stage each (overrides --concurrency)")
+    parser.add_argument("--duration", type=float, default=10,
+                        help="seconds per stage")
+    parser.add_argument("--mix", default=DEFAULT_MIX,
+                        help="scenario weights, e.g. " + DEFAULT_MIX)
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--admin-token",
+                        default=os.getenv("BULK_ADMIN_TOKEN"),
+                        help="token of POST /users/bulk to register the "
+                        "users with (default: BULK_ADMIN_TOKEN)")
+    parser.add_argument("--json", action="store_true",
+                        help="print the reports as JSON")
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    stages = [int(c) for c in args.ramp.split(',')] if args.ramp \
+        else [args.concurrency]
+    try:
+        emails = register_users(args.base_url, max(stages),
+                                args.admin_token)
+    except (RuntimeError, requests.RequestException) as error:
+        sys.exit(f"Could not register the load test users: {error}")
+    reports = {}
+    for concurrency in stages:
+        report = run_stage(args.base_url, emails[:concurrency], mix,
+                           args.duration, args.timeout)
+        reports[concurrency] = report
+        if not args.json:
+            print_report(concurrency, report)
+    if args.json:
+        print(json.dumps(reports, indent=2))
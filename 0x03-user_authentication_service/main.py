@@ -1,10 +1,11 @@
 #!/usr/bin/env python3
 """ Module that query the web server for the corresponding endpoint
 """
+import os
 import requests
 
 
-BASE_URL = "http://0.0.0.0:5000"
+BASE_URL = os.getenv("BASE_URL", "http://0.0.0.0:5000")
 
 
 def register_user(email: str, password: str) -> None:
@@ -20,7 +21,7 @@ def register_user(email: str, password: str) -> None:
         response JSON is not as expected.
     """
     response = requests.post(
-            f"{BASE_URL}/register", data={"email": email, "password": password}
+            f"{BASE_URL}/users", data={"email": email, "password": password}
             )
     assert response.status_code == 200
     assert response.json() == {"email": email, "message": "user created"}
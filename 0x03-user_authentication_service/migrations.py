@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+""" Module that applies the schema migrations of the users database
+"""
+from sqlalchemy import Column, Integer, MetaData, String, Table, inspect
+from sqlalchemy.engine import Connection, Engine
+
+from user import User
+
+
+def _create_user_indexes(conn: Connection) -> None:
+    """ Create the lookup indexes of users on databases created before
+    they were declared on the model
+    """
+    existing = {index['name'] for index in inspect(conn).get_indexes(
+        User.__tablename__)}
+    for index in User.__table__.indexes:
+        if index.name not in existing:
+            index.create(conn)
+
+
+# Ordered (version, description, upgrade function) of the migrations;
+# append new ones with the next version number, never edit applied ones
+MIGRATIONS = [
+    (1, "index users email, session_id and reset_token",
+     _create_user_indexes),
+]
+
+schema_version = Table(
+    'schema_version', MetaData(),
+    Column('version', Integer, primary_key=True),
+    Column('description', String(250), nullable=False))
+
+
+def migrate(engine: Engine) -> int:
+    """ Apply the migrations newer than the schema version of the
+    database, each in its own transaction
+    Return:
+        the schema version of the database
+    """
+    with engine.begin() as conn:
+        schema_version.create(conn, checkfirst=True)
+        rows = conn.execute(schema_version.select()).fetchall()
+    current = max([row[0] for row in rows], default=0)
+
+    for version, description, upgrade in MIGRATIONS:
+        if version <= current:
+            continue
+        with engine.begin() as conn:
+            upgrade(conn)
+            conn.execute(schema_version.insert().values(
+                version=version, description=description))
+        current = version
+    return current
@@ -2,7 +2,7 @@
 #!/usr/bin/env python3
 """ A module that defines a SQLALchemy model
 """
-from sqlalchemy import Column, Integer, String
+from sqlalchemy import Column, Index, Integer, String
 from sqlalchemy.ext.declarative import declarative_base
 
 Base = declarative_base()
@@ -18,3 +18,15 @@ class User(Base):
     hashed_password = Column(String(250), nullable=False)
     session_id = Column(String(250), nullable=True)
     reset_token = Column(String(250), nullable=True)
+
+    # Lookups of find_user_by: unique email, and unique session_id and
+    # reset_token among the users that have one (partial indexes)
+    __table_args__ = (
+        Index('ix_users_email', email, unique=True),
+        Index('ix_users_session_id', session_id, unique=True,
+              sqlite_where=session_id.isnot(None),
+              postgresql_where=session_id.isnot(None)),
+        Index('ix_users_reset_token', reset_token, unique=True,
+              sqlite_where=reset_token.isnot(None),
+              postgresql_where=reset_token.isnot(None)),
+    )